@@ -0,0 +1,262 @@
+"""Benchmark repetível de update()/draw() em salas sintéticas (headless, driver de vídeo dummy).
+
+Uso: python benchmark.py                                  (roda tudo e grava benchmark.json)
+     python benchmark.py --saida base.json                (guarda uma baseline)
+     python benchmark.py --comparar base.json             (roda e aponta regressões contra a baseline)
+
+Cada cenário monta a sala (mapa + inimigos) e passa pelo carregar_sala de verdade, então mede
+o mesmo caminho do jogo: ticks/s de update(), quadros/s de draw(), pico de memória (tracemalloc)
+e o tempo de montagem da sala. Inimigo fora do campo de visão dorme fora da agenda, então os
+cenários "acordados" tiram as paredes e alargam a visão até cobrir todos (pega regressão de custo
+por inimigo);
+cada resultado guarda quantos inimigos estavam ativos. Também mede a carga dos sprites do AssetManager (cache frio e quente).
+Sai com código 1 se --comparar achar alguma métrica pior que a tolerância.
+Baseline e rodada nova devem ser da mesma máquina (os números absolutos não valem entre máquinas).
+"""
+import argparse
+import json
+import math
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+os.environ.setdefault('SDL_VIDEODRIVER', 'dummy') # Sem janela: dá pra rodar em CI
+os.environ.setdefault('SDL_AUDIODRIVER', 'dummy')
+
+import pygame
+
+from roguelike_final import MANIFESTO_SPRITES, RAIO_VISAO, AssetManager, Game
+
+VERSAO_RESULTADO = 2
+SEED_BENCH = 1234
+
+# (largura/altura do mapa, quantidade de inimigos, visão cobrindo todos os inimigos)
+CENARIOS = [(8, 1, False), (64, 100, False), (256, 1000, False), (1024, 1, False), (1024, 10000, False),
+            (256, 1000, True), (1024, 10000, True)]
+
+# Métrica -> True se maior é melhor (usado na comparação)
+METRICAS = {
+    'update_tps': True,
+    'draw_fps': True,
+    'pico_memoria_kb': False,
+    'montagem_ms': False,
+}
+METRICAS_ASSETS = {'frio_ms': False, 'quente_ms': False}
+
+# O player anda em quadrado pra câmera, FOV e campo de fluxo trabalharem como numa partida
+ROTA_PLAYER = ['direita', 'baixo', 'esquerda', 'cima']
+TICKS_POR_PASSO = 8
+
+
+# --- SALAS SINTÉTICAS ---
+def lado_regiao(tamanho, n_inimigos):
+    # Densidade ~25% numa região ao redor do spawn (se espalhar no mapa todo, quase ninguém aparece)
+    return min(tamanho, max(3, math.ceil(math.sqrt(n_inimigos * 4))))
+
+def sala_sintetica(tamanho, n_inimigos, seed=SEED_BENCH, paredes=0.1):
+    """Sala quadrada com ~10% de paredes e os inimigos espalhados em volta do centro"""
+    rng = random.Random(seed)
+    mapa = [[0 if rng.random() < paredes else 1 for _ in range(tamanho)] for _ in range(tamanho)]
+    centro = tamanho // 2
+    mapa[centro][centro] = 1
+
+    lado = lado_regiao(tamanho, n_inimigos)
+    x0 = y0 = max(0, centro - lado // 2)
+    livres = [(x, y) for y in range(y0, min(tamanho, y0 + lado)) for x in range(x0, min(tamanho, x0 + lado))
+              if (x, y) != (centro, centro)]
+    posicoes = rng.sample(livres, min(n_inimigos, len(livres)))
+    for x, y in posicoes:
+        mapa[y][x] = 1
+
+    inimigos = [{'nome': 'Goblin', 'vida': 30, 'dano': 5, 'xp': 20, 'pos': pos} for pos in posicoes]
+    return {'mapa': mapa, 'tipo': 'combate', 'inimigos': inimigos, 'obj': [],
+            'spawn': (centro, centro), 'portal': (centro, centro)}
+
+def raio_acordados(tamanho, n_inimigos):
+    """Raio de visão que alcança a região inteira dos inimigos (a diagonal, com folga pra rota do player)"""
+    return math.ceil(lado_regiao(tamanho, n_inimigos) * 0.75) + 2
+
+def montar_jogo(sala, headless, raio_visao=RAIO_VISAO):
+    """Game com a sala sintética carregada e o player já em jogo (imortal, pra não acabar a run)"""
+    jogo = Game(headless=headless, seed=SEED_BENCH, modo_dirty=False, gravar=None)
+    jogo.visao.raio = raio_visao
+    jogo.salas = [sala]
+    jogo.carregar_sala(0)
+    jogo.step(['confirmar'])
+    jogo.player.vida_max = jogo.player.vida = 10**9
+    return jogo
+
+def acoes_do_tick(tick):
+    if tick % TICKS_POR_PASSO: return ()
+    return (ROTA_PLAYER[tick // TICKS_POR_PASSO % len(ROTA_PLAYER)],)
+
+
+# --- MEDIÇÕES ---
+# Tempos contam em blocos de uma volta inteira da rota (mesmo trabalho em todo bloco) e fica o
+# bloco mais rápido: o ruído da máquina só deixa mais lento, nunca mais rápido
+TICKS_BLOCO = TICKS_POR_PASSO * len(ROTA_PLAYER)
+
+def medir_update(jogo, ticks):
+    melhor = float('inf')
+    for bloco in range(max(1, ticks // TICKS_BLOCO) + 1): # O bloco 0 é aquecimento
+        inicio = time.perf_counter()
+        for _ in range(TICKS_BLOCO):
+            jogo.step(acoes_do_tick(jogo.tick))
+        if bloco: melhor = min(melhor, time.perf_counter() - inicio)
+    return TICKS_BLOCO / melhor
+
+def medir_draw(jogo, quadros):
+    """Só o draw() entra no tempo; o update() roda entre os quadros pra cena mudar"""
+    jogo.draw() # Primeiro quadro carrega sprites: fica fora da medição
+    melhor = float('inf')
+    for _ in range(max(1, quadros // TICKS_BLOCO)):
+        total = 0.0
+        for _ in range(TICKS_BLOCO):
+            jogo.step(acoes_do_tick(jogo.tick))
+            inicio = time.perf_counter()
+            jogo.draw()
+            total += time.perf_counter() - inicio
+        melhor = min(melhor, total)
+    return TICKS_BLOCO / melhor
+
+def medir_montagem(jogo, repeticoes):
+    """carregar_sala de novo na mesma sala (o menor tempo)"""
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        jogo.carregar_sala(0)
+        tempos.append(time.perf_counter() - inicio)
+    return min(tempos) * 1000
+
+def contar_ativos(jogo):
+    """Inimigos vivos que estão na agenda (acordados)"""
+    return sum(1 for ini in jogo.inimigos if ini.vivo and not ini.dormindo)
+
+def medir_memoria(tamanho, n_inimigos, ticks, raio_visao, paredes):
+    """Pico durante montagem + alguns ticks (passada separada: tracemalloc deixa tudo mais lento)"""
+    tracemalloc.start()
+    try:
+        jogo = montar_jogo(sala_sintetica(tamanho, n_inimigos, paredes=paredes), headless=True, raio_visao=raio_visao)
+        for _ in range(ticks):
+            jogo.step(acoes_do_tick(jogo.tick))
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return pico / 1024
+
+def medir_assets(repeticoes):
+    """Carga de todos os sprites do manifesto: sem cache em disco (frio) e com (quente)"""
+    pygame.display.init()
+    pygame.display.set_mode((1, 1))
+    tempos = {nome: [] for nome in METRICAS_ASSETS}
+    for _ in range(repeticoes):
+        with tempfile.TemporaryDirectory() as pasta:
+            for nome in ('frio_ms', 'quente_ms'):
+                inicio = time.perf_counter()
+                assets = AssetManager(pasta_cache=pasta)
+                for chave in MANIFESTO_SPRITES:
+                    assets.obter(chave)
+                tempos[nome].append((time.perf_counter() - inicio) * 1000)
+    return {nome: min(valores) for nome, valores in tempos.items()}
+
+def rodar(ticks, quadros, repeticoes):
+    cenarios = []
+    for tamanho, n_inimigos, acordados in CENARIOS:
+        nome = f"{tamanho}x{tamanho}_{n_inimigos}" + ("_acordados" if acordados else "")
+        raio = raio_acordados(tamanho, n_inimigos) if acordados else RAIO_VISAO
+        paredes = 0.0 if acordados else 0.1 # Parede faz sombra no FOV: quem fica atrás dorme
+        print(f"  {nome}...", end='', flush=True)
+        headless = montar_jogo(sala_sintetica(tamanho, n_inimigos, paredes=paredes), headless=True, raio_visao=raio)
+        cenario = {
+            'nome': nome,
+            'tamanho': tamanho,
+            'inimigos': n_inimigos,
+            'raio_visao': raio,
+            'update_tps': medir_update(headless, ticks),
+            'ativos': contar_ativos(headless), # Depois das medições de update: quantos tiveram turno
+            'draw_fps': medir_draw(montar_jogo(sala_sintetica(tamanho, n_inimigos, paredes=paredes), headless=False, raio_visao=raio), quadros),
+            'pico_memoria_kb': medir_memoria(tamanho, n_inimigos, min(ticks, 60), raio, paredes),
+            'montagem_ms': medir_montagem(headless, repeticoes),
+        }
+        print(f" {cenario['update_tps']:.0f} ticks/s, {cenario['draw_fps']:.0f} fps, {cenario['ativos']} ativos")
+        cenarios.append(cenario)
+    return {
+        'versao': VERSAO_RESULTADO,
+        'python': platform.python_version(),
+        'pygame': pygame.version.ver,
+        'ticks': ticks,
+        'quadros': quadros,
+        'repeticoes': repeticoes,
+        'cenarios': cenarios,
+        'assets': medir_assets(repeticoes),
+    }
+
+
+# --- COMPARAÇÃO ---
+def variacao(novo, base, maior_melhor):
+    """Mudança relativa com sinal de 'melhora' (negativo = piorou)"""
+    if not base: return 0.0
+    mudanca = (novo - base) / base
+    return mudanca if maior_melhor else -mudanca
+
+def comparar(atual, baseline, tolerancia):
+    """Lista (onde, métrica, base, atual, variação, regrediu) de tudo que existe nos dois resultados"""
+    linhas = []
+    base_cenarios = {c['nome']: c for c in baseline.get('cenarios', [])}
+    for cenario in atual['cenarios']:
+        base = base_cenarios.get(cenario['nome'])
+        if base is None: continue
+        for metrica, maior_melhor in METRICAS.items():
+            v = variacao(cenario[metrica], base[metrica], maior_melhor)
+            linhas.append((cenario['nome'], metrica, base[metrica], cenario[metrica], v, v < -tolerancia))
+    for metrica, maior_melhor in METRICAS_ASSETS.items():
+        if metrica in baseline.get('assets', {}):
+            base = baseline['assets'][metrica]
+            v = variacao(atual['assets'][metrica], base, maior_melhor)
+            linhas.append(('assets', metrica, base, atual['assets'][metrica], v, v < -tolerancia))
+    return linhas
+
+def imprimir_comparacao(linhas, tolerancia):
+    print(f"{'Cenário':<16} {'Métrica':<16} {'Base':>12} {'Atual':>12} {'Variação':>9}")
+    for onde, metrica, base, novo, v, regrediu in linhas:
+        marca = '  REGRESSÃO' if regrediu else ''
+        print(f"{onde:<16} {metrica:<16} {base:>12.1f} {novo:>12.1f} {v * 100:>+8.1f}%{marca}")
+    regressoes = sum(1 for linha in linhas if linha[-1])
+    print(f"{regressoes} regressões (tolerância {tolerancia * 100:.0f}%)")
+    return regressoes
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de update/draw em salas sintéticas")
+    parser.add_argument('--saida', default='benchmark.json', help="Arquivo JSON com os resultados")
+    parser.add_argument('--comparar', help="Baseline (JSON de uma rodada anterior) pra detectar regressões")
+    parser.add_argument('--tolerancia', type=float, default=0.2, help="Piora relativa aceita antes de acusar regressão")
+    parser.add_argument('--ticks', type=int, default=640, help="Ticks de update() por cenário")
+    parser.add_argument('--quadros', type=int, default=160, help="Chamadas de draw() por cenário")
+    parser.add_argument('--repeticoes', type=int, default=5, help="Montagens de sala e cargas de sprites (fica a melhor)")
+    args = parser.parse_args()
+
+    print("Rodando cenários:")
+    resultado = rodar(args.ticks, args.quadros, args.repeticoes)
+    with open(args.saida, 'w', encoding='utf-8') as f:
+        json.dump(resultado, f, indent=2, ensure_ascii=False)
+    print(f"Assets: frio {resultado['assets']['frio_ms']:.1f} ms, quente {resultado['assets']['quente_ms']:.1f} ms")
+    print(f"Resultados em {args.saida}")
+
+    if args.comparar:
+        with open(args.comparar, encoding='utf-8') as f:
+            baseline = json.load(f)
+        if baseline.get('versao') != VERSAO_RESULTADO:
+            print(f"Baseline em formato diferente (versão {baseline.get('versao')}), comparação ignorada.")
+            sys.exit(1)
+        if imprimir_comparacao(comparar(resultado, baseline, args.tolerancia), args.tolerancia):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""Cliente fino do servidor.py: aplica o estado que chega num Game local e só desenha (nunca roda update).
+
+Uso: python cliente.py [--sessao nome] [--espectador] [--seed N] [--procedural]   (janela, joga pelas setas)
+     python cliente.py --bots 50 [--segundos 30] [--com-servidor]                (bots headless, teste de carga)
+
+Os bots usam a mesma política do simulacao_lote.py, decidindo em cima do espelho (o estado recebido).
+--com-servidor sobe o servidor no mesmo processo, pra testar tudo com um comando só.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+from roguelike_final import FPS, PERFIL, TECLAS_ACOES, Game
+from servidor import ACOES_REDE, PORTA_PADRAO, Servidor, codificar, decodificar_mapa
+from simulacao_lote import politica_script
+
+
+# --- ESPELHO DO ESTADO ---
+class Espelho:
+    """Game local com as mesmas entidades do servidor; as mensagens só mexem em posição/vida/estado"""
+    def __init__(self, headless):
+        self.jogo = Game(headless=headless, modo_dirty=False, gravar=None)
+        self.estado = {} # Estado plano acumulado (chave -> valor), igual ao do servidor
+        self.tick = 0
+
+    def receber(self, msg):
+        if msg['t'] == 'sala':
+            self.carregar_sala(msg['indice'], msg['dados'])
+        elif msg['t'] == 'estado':
+            self.tick = msg['tick']
+            if msg.get('completo'): self.estado = {}
+            self.estado.update(msg['mudou'])
+            for chave in msg.get('saiu', ()): self.estado.pop(chave, None)
+            self.aplicar(msg['mudou'])
+
+    def carregar_sala(self, indice, dados):
+        dados['mapa'] = decodificar_mapa(dados['mapa'])
+        self.jogo.salas = [None] * indice + [dados]
+        self.jogo.carregar_sala(indice)
+
+    def aplicar(self, mudou):
+        jogo = self.jogo
+        p = jogo.player
+        for chave, valor in mudou.items():
+            if chave == 'estado':
+                jogo.estado_atual = valor
+            elif chave == 'player':
+                x, y, p.vida, p.vida_max, p.forca, p.destreza, p.vitalidade, p.xp, p.nivel = valor
+                if (x, y) != (p.grid_x, p.grid_y): p.posicionar(x, y)
+            elif chave == 'arma':
+                p.arma_equipada = valor
+            elif chave == 'inv':
+                p.inventario = valor
+            elif chave == 'log':
+                jogo.log_msgs = valor
+            elif chave[0] == 'i':
+                ini = jogo.inimigos[int(chave[1:])]
+                x, y, vida, _ = valor
+                if ini.vivo and (x, y) != (ini.grid_x, ini.grid_y): ini.posicionar(x, y)
+                # Mesmo caminho do jogo: vida <= 0 tira da grade e das camadas
+                if vida != ini.vida: ini.tomar_dano(ini.vida - vida)
+            elif chave[0] == 'o':
+                jogo.objetos[int(chave[1:])].ativo = valor
+        jogo.atualizar_visao()
+
+    def quadro(self):
+        """Só desenha: o draw já desliza os visuais e a câmera pelo tempo do quadro"""
+        self.jogo.draw()
+
+
+# --- CONEXÃO ---
+async def conectar(host, porta, sessao, papel='jogador', seed=None, procedural=False):
+    reader, writer = await asyncio.open_connection(host, porta)
+    writer.write(codificar({'t': 'entrar', 'sessao': sessao, 'papel': papel, 'seed': seed, 'procedural': procedural}))
+    boas_vindas = json.loads(await reader.readline())
+    return reader, writer, boas_vindas
+
+async def receber(reader, espelho, estatisticas=None):
+    async for linha in reader:
+        msg = json.loads(linha)
+        espelho.receber(msg)
+        if estatisticas is not None and msg['t'] == 'estado':
+            estatisticas['mensagens'] += 1
+            estatisticas['bytes'] += len(linha)
+            # Quanto custaria mandar o estado inteiro em vez do delta
+            estatisticas['bytes_completo'] += len(codificar({'t': 'estado', 'tick': espelho.tick, 'mudou': espelho.estado}))
+
+def enviar_acao(writer, acao):
+    writer.write(codificar({'t': 'acao', 'acao': acao}))
+
+
+# --- JANELA ---
+async def jogar(args):
+    papel = 'espectador' if args.espectador else 'jogador'
+    reader, writer, boas_vindas = await conectar(args.host, args.porta, args.sessao, papel, args.seed, args.procedural)
+    print(f"Sessão '{boas_vindas['sessao']}' como {boas_vindas['papel']}")
+    espelho = Espelho(headless=False)
+    pygame.display.set_caption(f"Roguelike - {boas_vindas['sessao']} ({boas_vindas['papel']})")
+    recepcao = asyncio.create_task(receber(reader, espelho))
+
+    while not recepcao.done():
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                recepcao.cancel()
+            elif event.type == pygame.KEYDOWN and event.key in TECLAS_ACOES:
+                acao = TECLAS_ACOES[event.key]
+                if acao == 'perfil': PERFIL.alternar()
+                elif acao in ACOES_REDE and boas_vindas['papel'] == 'jogador': enviar_acao(writer, acao)
+        inicio = time.perf_counter()
+        t = PERFIL.agora()
+        espelho.quadro()
+        PERFIL.registrar('draw', t)
+        PERFIL.fim_quadro()
+        espelho.jogo.resolucao.medir(time.perf_counter() - inicio)
+        espelho.jogo.clock.tick() # Só mede o dt do quadro (o ritmo vem do sleep); o draw interpola com ele
+        await asyncio.sleep(1 / FPS)
+    writer.close()
+    pygame.quit()
+
+
+# --- BOTS ---
+async def bot(indice, args):
+    """Um jogador headless: decide a 60 Hz em cima do espelho e manda as ações pro servidor"""
+    reader, writer, _ = await conectar(args.host, args.porta, f"bot-{indice}", 'jogador', args.seed + indice, args.procedural)
+    espelho = Espelho(headless=True)
+    estatisticas = {'mensagens': 0, 'bytes': 0, 'bytes_completo': 0}
+    recepcao = asyncio.create_task(receber(reader, espelho, estatisticas))
+    rng = random.Random(args.seed + indice)
+    jogo = espelho.jogo
+
+    fim = time.perf_counter() + args.segundos
+    tick = 0
+    while time.perf_counter() < fim and not recepcao.done():
+        if espelho.estado: # Já recebeu o primeiro estado
+            acoes = politica_script(jogo, rng, tick)
+            if jogo.estado_atual in (jogo.STATE_GAMEOVER, jogo.STATE_WIN): acoes = ['reiniciar']
+            for acao in acoes: enviar_acao(writer, acao)
+            tick += 1
+        await asyncio.sleep(1 / FPS)
+    recepcao.cancel()
+    writer.close()
+    estatisticas['sala'] = jogo.sala_atual_idx
+    return estatisticas
+
+async def rodar_bots(args):
+    tarefa_servidor = None
+    if args.com_servidor:
+        servidor = Servidor()
+        tarefa_servidor = asyncio.create_task(servidor.servir(args.host, args.porta))
+        await asyncio.sleep(0.2) # Dá tempo do socket abrir
+    resultados = await asyncio.gather(*(bot(i, args) for i in range(args.bots)))
+    if tarefa_servidor: tarefa_servidor.cancel()
+
+    mensagens = sum(r['mensagens'] for r in resultados)
+    recebido = sum(r['bytes'] for r in resultados)
+    completo = sum(r['bytes_completo'] for r in resultados)
+    print(f"{args.bots} bots, {args.segundos:.0f}s: {mensagens} estados ({mensagens / args.segundos / args.bots:.1f}/s por bot)")
+    print(f"Recebido: {recebido / 1024:.1f} KB ({recebido / max(1, mensagens):.0f} bytes/estado); "
+          f"estado completo seria {completo / 1024:.1f} KB (delta = {recebido / max(1, completo) * 100:.0f}%)")
+    print(f"Sala mais longe: {max(r['sala'] for r in resultados) + 1}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cliente fino (janela) ou bots de teste do servidor.py")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--sessao', default='padrao')
+    parser.add_argument('--espectador', action='store_true', help="Só assiste (a sessão já tem jogador)")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--procedural', action='store_true')
+    parser.add_argument('--bots', type=int, default=0, help="Roda N bots headless em vez da janela")
+    parser.add_argument('--segundos', type=float, default=30.0, help="Duração do teste com bots")
+    parser.add_argument('--com-servidor', action='store_true', help="Sobe o servidor neste processo (com --bots)")
+    args = parser.parse_args()
+    asyncio.run(rodar_bots(args) if args.bots else jogar(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+"""Reproduz uma gravação (ROGUELIKE_GRAVAR=arquivo.rlrp python roguelike_final.py) e confere o estado final.
+
+Uso: python replay.py partida.rlrp              (headless, o mais rápido possível)
+     python replay.py partida.rlrp --tempo-real (com janela, a 60 FPS)
+
+Os dois modos passam pelo mesmo Game.update(); o replay só "aperta as teclas" no tick gravado.
+Sai com código 1 se o hash do estado final não bater (lógica não determinística / build diferente).
+Gravação de um jogo que caiu (sem rodapé) reproduz até o último evento, sem conferir o estado.
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+import pygame
+
+from roguelike_final import FPS, Game, hash_estado, ler_gravacao
+
+
+def reproduzir(caminho, tempo_real=False):
+    opcoes, save, eventos, total, hash_gravado = ler_gravacao(caminho)
+    # F5/F9 gravados ficam na memória, partindo do save que existia quando a partida foi gravada
+    jogo = Game(headless=not tempo_real, modo_dirty=False, gravar=None, arquivo_save=None, **opcoes)
+    jogo.save_memoria = save
+
+    inicio = time.perf_counter()
+    for tick in range(total):
+        if tempo_real:
+            for event in pygame.event.get():
+                if event.type == pygame.QUIT:
+                    pygame.quit(); sys.exit()
+            for acao in eventos.get(tick, ()):
+                jogo.aplicar_acao(acao)
+            jogo.update()
+            jogo.draw()
+            jogo.clock.tick(FPS)
+        else:
+            jogo.step(eventos.get(tick, ()))
+    segundos = time.perf_counter() - inicio
+
+    print(f"{total} ticks ({total / FPS:.0f}s de jogo) em {segundos:.2f}s ({total / segundos if segundos else 0:.0f} ticks/s)")
+    if hash_gravado is None:
+        print("Gravação sem rodapé (o jogo não fechou direito): reproduzida até o último evento, sem conferir o estado final.")
+        return True
+    ok = hash_estado(jogo) == hash_gravado
+    print("Estado final confere." if ok else "ESTADO FINAL DIFERENTE da gravação!")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay determinístico de uma partida gravada")
+    parser.add_argument('arquivo')
+    parser.add_argument('--tempo-real', action='store_true', help="Mostra a partida na janela, na velocidade normal")
+    args = parser.parse_args()
+    sys.exit(0 if reproduzir(args.arquivo, args.tempo_real) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,18 @@
 import pygame
 import sys
+import os
+import struct
+import hashlib
+import atexit
+import bisect
+import heapq
+import time
+import json
+import csv
 import random
+import numpy as np
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 
 # --- CONFIGURAÇÕES ---
 LARGURA_TELA = 800
@@ -9,6 +21,29 @@ TILE_W = 64
 TILE_H = 32
 FPS = 60
 
+# Renderização em chunks (tamanho em tiles e quantos chunks ficam em cache)
+TAM_CHUNK = 8
+MAX_CHUNKS_CACHE = 64
+MARGEM_CULLING = 128 # Pixels extras em volta da tela (sprites altos, boss)
+
+# Resolução do mundo: escalas possíveis (a UI fica sempre na resolução da janela)
+# ROGUELIKE_ESCALA=0.5 trava numa escala; sem ela, a escala acompanha o tempo dos quadros
+ESCALAS_RENDER = [1.0, 0.75, 0.5]
+MAX_UPDATES_QUADRO = 5 # Quadro muito lento: no máximo isso de ticks de lógica antes de desenhar
+
+# Campo de visão (shadowcasting): alcance em células
+RAIO_VISAO = 10
+
+# Cache de textos renderizados (HUD, log, inventário)
+MAX_TEXTOS_CACHE = 256
+
+# Pathfinding: até quantos passos do player os inimigos "sentem" o caminho
+RAIO_PERSEGUICAO = 32
+
+# Masmorra procedural: sequência de salas e tamanho padrão de cada uma
+TIPOS_SALAS = ['combate', 'combate', 'tesouro', 'fonte', 'boss']
+TAM_SALA_PROCEDURAL = (40, 40)
+
 # Cores (Placeholders para quando não tiver Sprite)
 CORES = {
     'bg': (20, 20, 30),
@@ -25,56 +60,226 @@ CORES = {
     'selecionado': (255, 255, 0)
 }
 
+# Ações do jogo (o teclado é só uma das fontes; o modo headless chama step(acoes) direto)
+TECLAS_ACOES = {
+    pygame.K_ESCAPE: 'pausa',
+    pygame.K_RETURN: 'confirmar',
+    pygame.K_UP: 'cima',
+    pygame.K_DOWN: 'baixo',
+    pygame.K_LEFT: 'esquerda',
+    pygame.K_RIGHT: 'direita',
+    pygame.K_SPACE: 'atacar',
+    pygame.K_i: 'inventario',
+    pygame.K_e: 'interagir',
+    pygame.K_r: 'reiniciar',
+    pygame.K_F3: 'perfil',
+    pygame.K_F5: 'salvar',
+    pygame.K_F9: 'carregar',
+}
+# Código de 1 byte por ação (gravação de replay)
+CODIGOS_ACOES = sorted(set(TECLAS_ACOES.values()))
+DIRECOES_ACOES = {'cima': (0, -1), 'baixo': (0, 1), 'esquerda': (-1, 0), 'direita': (1, 0)}
+
 # --- SISTEMA DE ASSETS ---
-# --- CLASSE DE ASSETS ADAPTADA PARA SUA PASTA ---
+PASTA_ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "miniature dungeon")
+BASE_ISO = os.path.join(PASTA_ASSETS, "Isometric")
+BASE_CHAR = os.path.join(PASTA_ASSETS, "Characters", "Male")
+PASTA_CACHE_SPRITES = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache_sprites")
+VERSAO_CACHE_SPRITES = 1 # Sobe quando mudar o jeito de processar (invalida o cache em disco)
+
+# Manifesto: chave -> de onde vem e como processar. 'base' reaproveita outro sprite já processado.
+MANIFESTO_SPRITES = {
+    # Kenney tiles costumam ser meio grandes, vamos forçar o tamanho do nosso Grid
+    'chao': {'arquivo': os.path.join(BASE_ISO, "stone_N.png"), 'tamanho': (TILE_W, int(TILE_H * 2))},
+    'player': {'arquivo': os.path.join(BASE_CHAR, "Male_0_Idle0.png"), 'tamanho': (40, 60)},
+    # Inimigos usam o mesmo sprite, mas pintado de outra cor
+    'inimigo': {'base': 'player', 'tinta': (200, 50, 50)},
+    'boss': {'arquivo': os.path.join(BASE_CHAR, "Male_0_Idle0.png"), 'tamanho': (80, 120), 'tinta': (100, 0, 100)},
+    'bau': {'arquivo': os.path.join(BASE_ISO, "chestClosed_N.png"), 'tamanho': (50, 50)},
+    # Fonte (Improviso: barril)
+    'fonte': {'arquivo': os.path.join(BASE_ISO, "barrel_N.png"), 'tamanho': (40, 50)},
+    # Portal (Escada para descer)
+    'portal': {'arquivo': os.path.join(BASE_ISO, "stairs_N.png"), 'tamanho': (TILE_W, int(TILE_H * 2.5))},
+}
+
+# --- ANIMAÇÕES (Characters/Male: Male_<direção>_<clip><quadro>.png) ---
+# clip -> (nome no arquivo, nº de quadros, segundos por quadro, repete?)
+# O pack não tem "Attack": o golpe usa a sequência Pickup.
+CLIPES_ANIMACAO = {
+    'parado': ('Idle', 1, 1.0, True),
+    'correndo': ('Run', 10, 0.06, True),
+    'ataque': ('Pickup', 10, 0.03, False),
+}
+# Variantes processadas a partir dos mesmos quadros (tamanho/tinta iguais aos sprites antigos)
+VARIANTES_ANIMACAO = {
+    'player': {'tamanho': (40, 60)},
+    'inimigo': {'base': 'player', 'tinta': (200, 50, 50)},
+    'boss': {'tamanho': (80, 120), 'tinta': (100, 0, 100)},
+}
+N_DIRECOES_SPRITE = 8
+# Passo no grid -> direção do sprite (folha da Kenney: 0 = NE, girando no sentido horário até 7 = N).
+# Na tela isométrica o passo é diagonal: +x desce pra direita (SE), +y desce pra esquerda (SO)
+DIRECOES_SPRITE = {(1, 0): 2, (0, 1): 4, (-1, 0): 6, (0, -1): 0}
+
+def registrar_animacoes(manifesto):
+    """Cria no manifesto uma chave por quadro e devolve (variante, clip, direção) -> [chaves]"""
+    chaves = {}
+    for variante, proc in VARIANTES_ANIMACAO.items():
+        for clip, (nome_arquivo, n_quadros, _, _) in CLIPES_ANIMACAO.items():
+            for direcao in range(N_DIRECOES_SPRITE):
+                lista = []
+                for i in range(n_quadros):
+                    chave = f"{variante}:{clip}:{direcao}:{i}"
+                    if 'base' in proc:
+                        entrada = {'base': f"{proc['base']}:{clip}:{direcao}:{i}"}
+                    else:
+                        entrada = {'arquivo': os.path.join(BASE_CHAR, f"Male_{direcao}_{nome_arquivo}{i}.png"), 'tamanho': proc['tamanho']}
+                    if 'tinta' in proc: entrada['tinta'] = proc['tinta']
+                    manifesto[chave] = entrada
+                    lista.append(chave)
+                chaves[(variante, clip, direcao)] = lista
+    return chaves
+
+# Os quadros são compartilhados: cada entidade guarda só o estado (clip, direção, tempo)
+CHAVES_QUADROS = registrar_animacoes(MANIFESTO_SPRITES)
+
+class Animador:
+    """Máquina de estados de animação de uma entidade (parado/correndo/ataque).
+    O tempo é em segundos, então a velocidade não depende do FPS do render."""
+    def __init__(self, variante):
+        self.variante = variante
+        self.clip = 'parado'
+        self.direcao = 3 # Virado pra câmera
+        self.tempo = 0.0
+
+    def olhar(self, dx, dy):
+        if (dx, dy) in DIRECOES_SPRITE:
+            self.direcao = DIRECOES_SPRITE[(dx, dy)]
+
+    def tocar(self, clip):
+        self.clip = clip
+        self.tempo = 0.0
+
+    def avancar(self, dt, movendo):
+        self.tempo += dt
+        _, n_quadros, duracao, repete = CLIPES_ANIMACAO[self.clip]
+        if not repete and self.tempo < n_quadros * duracao:
+            return # Golpe em andamento não é interrompido pelo movimento
+        clip = 'correndo' if movendo else 'parado'
+        if clip != self.clip: self.tocar(clip)
+
+    def chave_quadro(self):
+        _, n_quadros, duracao, repete = CLIPES_ANIMACAO[self.clip]
+        i = int(self.tempo / duracao)
+        i = i % n_quadros if repete else min(i, n_quadros - 1)
+        return CHAVES_QUADROS[(self.variante, self.clip, self.direcao)][i]
+
+class AtlasSprites:
+    """Empacota os sprites processados em páginas grandes (prateleiras) e devolve subsuperfícies"""
+    def __init__(self, tamanho=1024):
+        self.tamanho = tamanho
+        self.paginas = []
+        self.cursor_x = self.cursor_y = self.altura_prateleira = 0
+
+    def nova_pagina(self):
+        pagina = pygame.Surface((self.tamanho, self.tamanho), pygame.SRCALPHA)
+        if pygame.display.get_surface(): pagina = pagina.convert_alpha()
+        self.paginas.append(pagina)
+        self.cursor_x = self.cursor_y = self.altura_prateleira = 0
+
+    def adicionar(self, imagem):
+        w, h = imagem.get_size()
+        if w > self.tamanho or h > self.tamanho: return imagem # Não cabe: fica solto
+        if not self.paginas: self.nova_pagina()
+        if self.cursor_x + w > self.tamanho: # Próxima prateleira
+            self.cursor_x = 0
+            self.cursor_y += self.altura_prateleira
+            self.altura_prateleira = 0
+        if self.cursor_y + h > self.tamanho: self.nova_pagina()
+
+        pagina = self.paginas[-1]
+        rect = pygame.Rect(self.cursor_x, self.cursor_y, w, h)
+        pagina.blit(imagem, rect)
+        self.cursor_x += w
+        self.altura_prateleira = max(self.altura_prateleira, h)
+        return pagina.subsurface(rect)
+
 class AssetManager:
-    def __init__(self):
+    def __init__(self, carregar=True, manifesto=MANIFESTO_SPRITES, pasta_cache=PASTA_CACHE_SPRITES):
+        # Sprites são carregados sob demanda (obter), na primeira vez que alguém desenha.
+        # None = falhou/indisponível -> fallback geométrico só daquela chave.
         self.sprites = {}
-        
-        # Caminhos base baseados nos seus prints
-        # O "." significa a pasta atual onde está o script
-        base_iso = "assets/miniature dungeon/Isometric/"
-        base_char = "assets/miniature dungeon/Characters/Male/"
-        
-        try:
-            # 1. CARREGAR CHÃO (stone_N.png do Print 2)
-            img_chao = pygame.image.load(base_iso + "stone_N.png").convert_alpha()
-            # Ajuste fino: Kenney tiles costumam ser meio grandes, vamos forçar o tamanho do nosso Grid
-            self.sprites['chao'] = pygame.transform.scale(img_chao, (TILE_W, int(TILE_H * 2)))
-
-            # 2. CARREGAR PLAYER (Male_0_Idle0.png do Print 4)
-            img_human = pygame.image.load(base_char + "Male_0_Idle0.png").convert_alpha()
-            # Escala do personagem (ajuste conforme achar bonito)
-            img_human = pygame.transform.scale(img_human, (40, 60))
-            
-            self.sprites['player'] = img_human
-            
-            # 3. CRIAR INIMIGOS (Usando o mesmo sprite, mas pintando de outra cor)
-            # Inimigo Comum (Vermelho)
-            self.sprites['inimigo'] = self.tingir_imagem(img_human, (200, 50, 50))
-            # Boss (Grande e Roxo)
-            boss_base = pygame.transform.scale(img_human, (80, 120))
-            self.sprites['boss'] = self.tingir_imagem(boss_base, (100, 0, 100))
-
-            # 4. OBJETOS
-            # Baú (chestClose_N.png do Print 1)
-            img_bau = pygame.image.load(base_iso + "chestClose_N.png").convert_alpha()
-            self.sprites['bau'] = pygame.transform.scale(img_bau, (50, 50))
-            
-            # Fonte (Improviso: barrel_N.png do Print 1)
-            img_fonte = pygame.image.load(base_iso + "barrel_N.png").convert_alpha()
-            self.sprites['fonte'] = pygame.transform.scale(img_fonte, (40, 50))
-            
-            # Portal (stairs_N.png do Print 2 - Escada para descer)
-            img_portal = pygame.image.load(base_iso + "stairs_N.png").convert_alpha()
-            self.sprites['portal'] = pygame.transform.scale(img_portal, (TILE_W, int(TILE_H * 2.5)))
+        self.manifesto = manifesto
+        self.pasta_cache = pasta_cache
+        self.atlas = AtlasSprites()
+        self.escalados = {} # (chave, escala) -> sprite redimensionado
+        # Modo headless: sem display não dá pra converter imagens (e nada é desenhado)
+        self.carregar = carregar
+
+    def obter(self, chave):
+        if chave in self.sprites: return self.sprites[chave]
+        img = None
+        if self.carregar and chave in self.manifesto:
+            try:
+                img = self.atlas.adicionar(self.processar(chave))
+            except Exception as e:
+                print(f"ERRO DE ARQUIVO ({chave}): {e}")
+                print("Rodando com fallback geométrico pra esse sprite.")
+        self.sprites[chave] = img
+        return img
+
+    def chave_cache(self, chave):
+        """Hash do que define o sprite processado (arquivo + mtime + transformações)"""
+        entrada = self.manifesto[chave]
+        partes = [VERSAO_CACHE_SPRITES, entrada.get('tamanho'), entrada.get('tinta')]
+        if 'base' in entrada:
+            partes.append(self.chave_cache(entrada['base']))
+        else:
+            partes += [entrada['arquivo'], os.path.getmtime(entrada['arquivo'])]
+        return hashlib.sha1(repr(partes).encode()).hexdigest()
 
-            print("Sucesso! Sprites do Kenney carregados.")
+    def processar(self, chave):
+        """Imagem final (escalada/tingida) da chave: do cache em disco ou processando do PNG"""
+        entrada = self.manifesto[chave]
+        caminho_cache = os.path.join(self.pasta_cache, self.chave_cache(chave) + ".rgba")
+        img = self.ler_cache(caminho_cache)
+        if img is not None: return img
+
+        if 'base' in entrada:
+            img = self.processar(entrada['base'])
+        else:
+            img = pygame.image.load(entrada['arquivo']).convert_alpha()
+        if 'tamanho' in entrada:
+            img = pygame.transform.scale(img, entrada['tamanho'])
+        if 'tinta' in entrada:
+            img = self.tingir_imagem(img, entrada['tinta'])
+        self.gravar_cache(caminho_cache, img)
+        return img
+
+    def ler_cache(self, caminho):
+        try:
+            with open(caminho, 'rb') as f:
+                dados = f.read()
+        except OSError:
+            return None
+        if len(dados) < 12: return None # Cortado antes do cabeçalho: processa de novo e regrava
+        magica, w, h = struct.unpack_from('<4sII', dados)
+        if magica != b'RLSP' or len(dados) != 12 + w * h * 4: return None
+        return pygame.image.frombytes(dados[12:], (w, h), 'RGBA').convert_alpha()
 
-        except Exception as e:
-            print(f"ERRO DE ARQUIVO: {e}")
-            print("Verifique se o nome das pastas está igualzinho ao Windows (maiúscula/minúscula).")
-            print("Rodando com quadrados coloridos de fallback.")
+    def gravar_cache(self, caminho, img):
+        # Cache é só otimização: pasta sem permissão de escrita não pode derrubar o jogo
+        try:
+            os.makedirs(self.pasta_cache, exist_ok=True)
+            w, h = img.get_size()
+            # Arquivo temporário + os.replace: se o jogo cair no meio, não sobra cache pela metade
+            temporario = f"{caminho}.{os.getpid()}.tmp"
+            with open(temporario, 'wb') as f:
+                f.write(struct.pack('<4sII', b'RLSP', w, h))
+                f.write(pygame.image.tobytes(img, 'RGBA'))
+            os.replace(temporario, caminho)
+        except OSError:
+            pass
 
     def tingir_imagem(self, imagem, cor):
         """Cria uma cópia da imagem e pinta ela com uma cor (para inimigos)"""
@@ -86,52 +291,609 @@ class AssetManager:
         imagem_colorida.blit(filtro, (0,0), special_flags=pygame.BLEND_MULT)
         return imagem_colorida
 
-    def desenhar(self, superficie, chave, x, y, cor_placeholder, forma="losango"):
+    def posicionar(self, img, chave, x, y):
+        """Rect do sprite na tela a partir do ponto do tile (x, y)"""
+        rect = img.get_rect()
+
+        # --- AJUSTE DE PIVÔ (CENTRALIZAÇÃO) ---
+        if chave == 'chao':
+            # Chão centraliza no meio do tile
+            rect.center = (x, y + TILE_H//2)
+        elif chave == 'portal':
+            # Escada precisa alinhar um pouco diferente pra parecer que desce
+            rect.midtop = (x, y - 10)
+        else:
+            # Personagens e Objetos: Pé da imagem no centro do losango
+            rect.midbottom = (x, y + TILE_H)
+        return rect
+
+    def colocar(self, img, chave, x, y, escala=1.0):
+        """(superfície, posição) pro blit, com o mundo desenhado na escala dada"""
+        rect = self.posicionar(img, chave, x, y)
+        if escala == 1.0: return img, rect
+        if (chave, escala) not in self.escalados:
+            w, h = img.get_size()
+            self.escalados[(chave, escala)] = pygame.transform.smoothscale(img, (max(1, round(w * escala)), max(1, round(h * escala))))
+        return self.escalados[(chave, escala)], (round(rect.x * escala), round(rect.y * escala))
+
+    def desenhar(self, superficie, chave, x, y, cor_placeholder, forma="losango", escala=1.0):
         """Desenha sprite ou fallback geométrico"""
-        if chave in self.sprites:
-            img = self.sprites[chave]
-            rect = img.get_rect()
-            
-            # --- AJUSTE DE PIVÔ (CENTRALIZAÇÃO) ---
-            if chave == 'chao':
-                # Chão centraliza no meio do tile
-                rect.center = (x, y + TILE_H//2)
-            elif chave == 'portal':
-                # Escada precisa alinhar um pouco diferente pra parecer que desce
-                rect.midtop = (x, y - 10)
-            else:
-                # Personagens e Objetos: Pé da imagem no centro do losango
-                rect.midbottom = (x, y + TILE_H)
-                
-            superficie.blit(img, rect)
+        img = self.obter(chave)
+        if img is not None:
+            superficie.blit(*self.colocar(img, chave, x, y, escala))
+            PERFIL.contar('blits')
         else:
-            # Fallback Geométrico (Código antigo)
+            # Fallback Geométrico (Código antigo), nas coordenadas da escala
+            e = escala
             if forma == "losango":
-                pontos = [(x, y), (x + TILE_W/2, y + TILE_H/2), (x, y + TILE_H), (x - TILE_W/2, y + TILE_H/2)]
+                pontos = [(x*e, y*e), ((x + TILE_W/2)*e, (y + TILE_H/2)*e), (x*e, (y + TILE_H)*e), ((x - TILE_W/2)*e, (y + TILE_H/2)*e)]
                 pygame.draw.polygon(superficie, cor_placeholder, pontos)
                 pygame.draw.polygon(superficie, (0,0,0), pontos, 1)
             elif forma == "circulo":
-                pygame.draw.circle(superficie, cor_placeholder, (int(x), int(y + TILE_H//2)), 15)
+                pygame.draw.circle(superficie, cor_placeholder, (int(x*e), int((y + TILE_H//2)*e)), round(15*e))
             elif forma == "retangulo":
-                pygame.draw.rect(superficie, cor_placeholder, (x - 15, y, 30, 30))
+                pygame.draw.rect(superficie, cor_placeholder, ((x - 15)*e, y*e, 30*e, 30*e))
 
 # --- CÂMERA ---
+def suavizar(fator, dt):
+    """Fator de lerp calibrado a 60 FPS convertido pro dt do quadro (mesmo deslize em qualquer FPS)"""
+    return 1 - (1 - fator) ** (dt * FPS)
+
 class Camera:
     def __init__(self, width, height):
         self.camera = pygame.math.Vector2(0, 0)
         self.width = width
         self.height = height
 
-    def update(self, alvo):
+    def update(self, alvo, dt=1 / FPS):
         x = -alvo.visual_x + int(LARGURA_TELA / 2)
         y = -alvo.visual_y + int(ALTURA_TELA / 2)
-        # Suavização simples
-        self.camera.x += (x - self.camera.x) * 0.1
-        self.camera.y += (y - self.camera.y) * 0.1
+        # Suavização simples (encaixa no alvo quando falta menos de um pixel, pra câmera parar de verdade)
+        fator = suavizar(0.1, dt)
+        self.camera.x += (x - self.camera.x) * fator
+        self.camera.y += (y - self.camera.y) * fator
+        if abs(x - self.camera.x) < 0.05 and abs(y - self.camera.y) < 0.05:
+            self.camera.update(x, y)
 
     def apply(self, x, y):
         return x + self.camera.x, y + self.camera.y
 
+# --- RESOLUÇÃO ADAPTATIVA ---
+def escala_fixa():
+    """ROGUELIKE_ESCALA -> a escala de ESCALAS_RENDER mais próxima (None = adaptativa)"""
+    valor = os.environ.get('ROGUELIKE_ESCALA')
+    if not valor: return None
+    return min(ESCALAS_RENDER, key=lambda escala: abs(escala - float(valor)))
+
+class ResolucaoAdaptativa:
+    """Escolhe a escala do mundo pela média do tempo de trabalho dos quadros (sem a espera do clock).
+    Desce um degrau perto de estourar o orçamento; sobe quando a projeção na escala de cima cabe com folga."""
+    ORCAMENTO = 1 / FPS
+    LIMITE_DESCER = 0.9 # Fração do orçamento
+    LIMITE_SUBIR = 0.6
+    HISTERESE = 30 # Quadros sem trocar de novo depois de uma troca
+
+    def __init__(self, fixa=None):
+        self.fixa = fixa
+        self.nivel = ESCALAS_RENDER.index(fixa) if fixa is not None else 0
+        self.media = None
+        self.espera = 0
+
+    @property
+    def escala(self):
+        return ESCALAS_RENDER[self.nivel]
+
+    def medir(self, segundos):
+        if self.fixa is not None: return
+        self.media = segundos if self.media is None else self.media * 0.9 + segundos * 0.1
+        if self.espera:
+            self.espera -= 1
+        elif self.media > self.ORCAMENTO * self.LIMITE_DESCER and self.nivel < len(ESCALAS_RENDER) - 1:
+            self.nivel += 1
+            self.espera = self.HISTERESE
+        elif self.nivel > 0:
+            # Custo do desenho cresce com a área: projeta a média na escala de cima
+            projecao = self.media * (ESCALAS_RENDER[self.nivel - 1] / self.escala) ** 2
+            if projecao < self.ORCAMENTO * self.LIMITE_SUBIR:
+                self.nivel -= 1
+                self.espera = self.HISTERESE
+
+# --- CHÃO EM CHUNKS ---
+class CamadaChao:
+    """Chão pré-renderizado em blocos de TAM_CHUNK x TAM_CHUNK tiles.
+    Só os chunks que aparecem na tela são desenhados (e construídos, sob demanda)."""
+    def __init__(self, assets, visao=None):
+        self.assets = assets
+        self.visao = visao # Só desenha o que o player já explorou
+        self.mapa = None
+        self.chunks = OrderedDict() # (cx, cy, escala) -> (superficie, origem_x, origem_y), ordem = LRU
+
+    def definir_mapa(self, mapa):
+        self.mapa = mapa
+        self.chunks.clear()
+
+    def invalidar(self, x, y):
+        for escala in ESCALAS_RENDER:
+            self.chunks.pop((x // TAM_CHUNK, y // TAM_CHUNK, escala), None)
+
+    @staticmethod
+    def geometria_chunk(cx, cy):
+        """(origem_x, origem_y, w, h) do chunk em coordenadas iso do mundo (na escala 1)"""
+        x0, y0 = cx * TAM_CHUNK, cy * TAM_CHUNK
+        # Limites do losango do chunk em coordenadas iso + margem pra altura do sprite
+        origem_x = (x0 - (y0 + TAM_CHUNK - 1)) * (TILE_W / 2) - TILE_W
+        origem_y = (x0 + y0) * (TILE_H / 2) - TILE_H * 2
+        w = int((2 * TAM_CHUNK - 2) * (TILE_W / 2) + TILE_W * 2)
+        h = int((2 * TAM_CHUNK - 2) * (TILE_H / 2) + TILE_H * 4)
+        return origem_x, origem_y, w, h
+
+    def construir_chunk(self, cx, cy, escala=1.0):
+        x0, y0 = cx * TAM_CHUNK, cy * TAM_CHUNK
+        origem_x, origem_y, w, h = self.geometria_chunk(cx, cy)
+
+        superficie = pygame.Surface((w, h), pygame.SRCALPHA)
+        for y in range(y0, min(y0 + TAM_CHUNK, len(self.mapa))):
+            linha = self.mapa[y]
+            for x in range(x0, min(x0 + TAM_CHUNK, len(linha))):
+                if linha[x] == 1 and (self.visao is None or self.visao.foi_explorado(x, y)):
+                    iso_x, iso_y = Entidade.cart_para_iso(x, y)
+                    self.assets.desenhar(superficie, 'chao', iso_x - origem_x, iso_y - origem_y, CORES['chao'], 'losango')
+        if escala != 1.0: # Variante reduzida do mesmo chunk (fica no cache junto com a original)
+            superficie = pygame.transform.smoothscale(superficie, (round(w * escala), round(h * escala)))
+        return superficie, origem_x, origem_y
+
+    def celulas_visiveis(self, camera):
+        """Faixa de células (x0, y0, x1, y1) que cobre a tela, pelo inverso da projeção"""
+        ox, oy = camera.apply(0, 0)
+        cantos = [(-MARGEM_CULLING, -MARGEM_CULLING), (LARGURA_TELA + MARGEM_CULLING, -MARGEM_CULLING),
+                  (-MARGEM_CULLING, ALTURA_TELA + MARGEM_CULLING), (LARGURA_TELA + MARGEM_CULLING, ALTURA_TELA + MARGEM_CULLING)]
+        pontos = [Entidade.iso_para_cart(sx - ox, sy - oy) for sx, sy in cantos]
+        xs = [p[0] for p in pontos]
+        ys = [p[1] for p in pontos]
+        altura, largura = len(self.mapa), len(self.mapa[0])
+        x0, x1 = max(0, int(min(xs))), min(largura - 1, int(max(xs)) + 1)
+        y0, y1 = max(0, int(min(ys))), min(altura - 1, int(max(ys)) + 1)
+        return x0, y0, x1, y1
+
+    def desenhar(self, tela, camera, escala=1.0):
+        x0, y0, x1, y1 = self.celulas_visiveis(camera)
+        if x0 > x1 or y0 > y1: return
+        tela_rect = pygame.Rect(0, 0, LARGURA_TELA, ALTURA_TELA) # Coordenadas lógicas (antes da escala)
+        lote = []
+
+        for cy in range(y0 // TAM_CHUNK, y1 // TAM_CHUNK + 1):
+            for cx in range(x0 // TAM_CHUNK, x1 // TAM_CHUNK + 1):
+                # A faixa cartesiana é um retângulo "girado"; os chunks dos cantos dela caem fora da tela.
+                # Testa antes de construir, pra não renderizar nem ocupar vaga no LRU à toa
+                origem_x, origem_y, w, h = self.geometria_chunk(cx, cy)
+                cam_x, cam_y = camera.apply(origem_x, origem_y)
+                if not tela_rect.colliderect((int(cam_x), int(cam_y), w, h)): continue
+
+                chave = (cx, cy, escala)
+                if chave in self.chunks:
+                    self.chunks.move_to_end(chave)
+                else:
+                    self.chunks[chave] = self.construir_chunk(cx, cy, escala)
+                    if len(self.chunks) > MAX_CHUNKS_CACHE:
+                        self.chunks.popitem(last=False)
+
+                superficie = self.chunks[chave][0]
+                pos = (int(cam_x), int(cam_y)) if escala == 1.0 else (round(cam_x * escala), round(cam_y * escala))
+                lote.append((superficie, pos))
+        tela.blits(lote, doreturn=False)
+        PERFIL.contar('blits', len(lote))
+
+# --- FILA DE RENDER (CAMADAS) ---
+def na_tela(cam_x, cam_y):
+    return -MARGEM_CULLING < cam_x < LARGURA_TELA + MARGEM_CULLING and -MARGEM_CULLING < cam_y < ALTURA_TELA + MARGEM_CULLING
+
+class CamadaRender:
+    """Entidades de uma camada em ordem de profundidade isométrica (x + y, depois x).
+    A ordem é mantida com bisect quando alguém muda de célula, em vez de ordenar todo quadro."""
+    def __init__(self):
+        self.chaves = []
+        self.entidades = [] # Mesma ordem das chaves
+        self.chave_de = {} # id(entidade) -> chave atual
+        self.seq = 0 # Desempate estável
+
+    def chave(self, ent):
+        self.seq += 1
+        return (ent.grid_x + ent.grid_y, ent.grid_x, self.seq)
+
+    def preencher(self, entidades):
+        """Carga da sala: uma ordenação só, em vez de um insert por entidade"""
+        pares = sorted(((self.chave(ent), ent) for ent in entidades), key=lambda par: par[0])
+        self.chaves = [chave for chave, _ in pares]
+        self.entidades = [ent for _, ent in pares]
+        for chave, ent in pares:
+            self.chave_de[id(ent)] = chave
+            ent.camada = self
+
+    def adicionar(self, ent):
+        chave = self.chave(ent)
+        i = bisect.bisect(self.chaves, chave)
+        self.chaves.insert(i, chave)
+        self.entidades.insert(i, ent)
+        self.chave_de[id(ent)] = chave
+        ent.camada = self
+
+    def remover(self, ent):
+        i = bisect.bisect_left(self.chaves, self.chave_de.pop(id(ent)))
+        del self.chaves[i]
+        del self.entidades[i]
+        ent.camada = None
+
+    def reposicionar(self, ent):
+        """Entidade mudou de célula: volta pro lugar certo da ordem"""
+        self.remover(ent)
+        self.adicionar(ent)
+
+    def faixa(self, p0, p1):
+        """Entidades com profundidade (x + y) entre p0 e p1"""
+        i = bisect.bisect_left(self.chaves, (p0,))
+        j = bisect.bisect_left(self.chaves, (p1 + 1,))
+        return self.entidades[i:j]
+
+class FilaRender:
+    """Camadas persistentes desenhadas em ordem: chão, objetos, atores, barras de vida, UI.
+    Objetos e atores ficam ordenados entre quadros; cada camada sai num único Surface.blits."""
+    CAMADAS = ['objetos', 'atores']
+
+    def __init__(self, assets):
+        self.assets = assets
+        self.camadas = {nome: CamadaRender() for nome in self.CAMADAS}
+        self.barras = {} # Largura da parte verde -> superfície da barra de vida
+
+    def montar(self, entidades):
+        """Recomeça as camadas com as entidades da sala"""
+        self.camadas = {nome: CamadaRender() for nome in self.CAMADAS}
+        for nome, camada in self.camadas.items():
+            camada.preencher([ent for ent in entidades if ent.CAMADA == nome])
+
+    def visiveis(self, camera, visao, nomes=CAMADAS):
+        """(entidade, cam_x, cam_y) de quem aparece no quadro, camada por camada, em ordem de profundidade"""
+        # A tela cobre uma faixa contínua de x + y (iso_y = (x + y) * TILE_H / 2); folga pro deslize visual
+        meio_tile = TILE_H / 2
+        p0 = int((-MARGEM_CULLING - camera.camera.y) // meio_tile) - 2
+        p1 = int((ALTURA_TELA + MARGEM_CULLING - camera.camera.y) // meio_tile) + 2
+        for nome in nomes:
+            for ent in self.camadas[nome].faixa(p0, p1):
+                cam_x, cam_y = camera.apply(ent.visual_x, ent.visual_y)
+                if na_tela(cam_x, cam_y) and ent.aparece(visao):
+                    yield ent, cam_x, cam_y
+
+    def barra(self, ent):
+        verde = max(0, int(20 * ent.vida / ent.vida_max)) if ent.vida_max > 0 else 0
+        if verde not in self.barras:
+            surf = pygame.Surface((20, 4))
+            surf.fill((255,0,0))
+            surf.fill((0,255,0), (0, 0, verde, 4))
+            self.barras[verde] = surf
+        return self.barras[verde]
+
+    def emitir(self, tela, lote):
+        if lote:
+            tela.blits(lote, doreturn=False)
+            PERFIL.contar('blits', len(lote))
+            lote.clear()
+
+    def desenhar(self, tela, camera, visao, escala=1.0):
+        """Objetos e atores na superfície do mundo (na escala dada). Retorna o lote das barras de vida,
+        que vai pra tela na resolução da janela, junto com a UI."""
+        barras = []
+        for nome in self.CAMADAS:
+            lote = []
+            for ent, cam_x, cam_y in self.visiveis(camera, visao, (nome,)):
+                chave, cor, forma = ent.aparencia()
+                img = self.assets.obter(chave)
+                if img is not None:
+                    lote.append(self.assets.colocar(img, chave, cam_x, cam_y, escala))
+                else:
+                    # Fallback geométrico não entra no lote: esvazia antes pra manter a ordem
+                    self.emitir(tela, lote)
+                    self.assets.desenhar(tela, chave, cam_x, cam_y, cor, forma, escala)
+                if ent.BARRA_VIDA:
+                    barras.append((self.barra(ent), (cam_x-10, cam_y-30)))
+            self.emitir(tela, lote)
+        return barras
+
+# --- PATHFINDING (FLOW FIELD) ---
+class CampoFluxo:
+    """Mapa de distâncias (BFS) centrado no player, compartilhado por todos os inimigos.
+    Só é recalculado quando o player muda de célula (ou o mapa muda); cada inimigo
+    decide o passo olhando os 4 vizinhos, custo O(1)."""
+    VIZINHOS = ((1, 0), (-1, 0), (0, 1), (0, -1))
+
+    def __init__(self, raio=RAIO_PERSEGUICAO):
+        self.raio = raio
+        self.dist = {} # (x, y) -> passos até o player
+        self.chave = None
+        self.sujo = False
+
+    def atualizar(self, mapa, versao, alvo_x, alvo_y):
+        chave = (id(mapa), versao, alvo_x, alvo_y)
+        if chave == self.chave: return
+        self.chave = chave
+        # Preguiçoso: a BFS só roda quando algum inimigo for decidir um passo
+        self.mapa, self.alvo = mapa, (alvo_x, alvo_y)
+        self.sujo = True
+
+    def recalcular(self):
+        self.sujo = False
+        mapa = self.mapa
+        altura, largura = len(mapa), len(mapa[0])
+        dist = {self.alvo: 0}
+        fronteira = [self.alvo]
+        passos = 0
+        while fronteira and passos < self.raio:
+            passos += 1
+            proxima = []
+            for x, y in fronteira:
+                for dx, dy in self.VIZINHOS:
+                    nx, ny = x + dx, y + dy
+                    if (nx, ny) in dist: continue
+                    if 0 <= ny < altura and 0 <= nx < largura and mapa[ny][nx] != 0: # 0 é parede
+                        dist[(nx, ny)] = passos
+                        proxima.append((nx, ny))
+            fronteira = proxima
+        self.dist = dist
+
+    def proximo_passo(self, x, y, bloqueada=None):
+        """Vizinho livre mais perto do player, ou None (fora do alcance / bloqueado)"""
+        if self.sujo: self.recalcular()
+        atual = self.dist.get((x, y))
+        if atual is None: return None
+        melhor = None
+        for dx, dy in self.VIZINHOS:
+            pos = (x + dx, y + dy)
+            d = self.dist.get(pos)
+            if d is not None and d < atual and not (bloqueada and bloqueada(pos)):
+                melhor, atual = pos, d
+        return melhor
+
+# --- CAMPO DE VISÃO / NÉVOA DE GUERRA ---
+class CampoVisao:
+    """FOV por shadowcasting recursivo (0 = parede bloqueia a visão).
+    Só recalcula quando o player muda de célula ou o mapa muda. As células já vistas
+    ficam num bitset guardado na própria sala."""
+    # Multiplicadores (xx, xy, yx, yy) dos 8 octantes
+    OCTANTES = [(1, 0, 0, 1), (0, 1, 1, 0), (0, -1, 1, 0), (-1, 0, 0, 1),
+                (-1, 0, 0, -1), (0, -1, -1, 0), (0, 1, -1, 0), (1, 0, 0, -1)]
+
+    def __init__(self, raio=RAIO_VISAO):
+        self.raio = raio
+        self.chave = None
+        self.versao = 0 # Sobe quando células novas são exploradas (o chão precisa redesenhar)
+
+    def definir_sala(self, sala):
+        self.mapa = sala['mapa']
+        self.altura, self.largura = len(self.mapa), len(self.mapa[0])
+        if 'explorado' not in sala:
+            sala['explorado'] = bytearray((self.largura * self.altura + 7) // 8)
+        self.explorado = sala['explorado']
+        self.visiveis = set()
+        self.chave = None
+        self.versao += 1
+
+    def foi_explorado(self, x, y):
+        i = y * self.largura + x
+        return self.explorado[i >> 3] >> (i & 7) & 1
+
+    def visivel(self, x, y):
+        return (x, y) in self.visiveis
+
+    def atualizar(self, versao_mapa, px, py):
+        """Recalcula se precisar. Retorna (células exploradas pela primeira vez, células que entraram na visão)."""
+        chave = (id(self.mapa), versao_mapa, px, py)
+        if chave == self.chave: return (), ()
+        self.chave = chave
+
+        antes = self.visiveis
+        self.visiveis = {(px, py)}
+        for octante in self.OCTANTES:
+            self.projetar(px, py, 1, 1.0, 0.0, *octante)
+
+        novas = []
+        for x, y in self.visiveis:
+            if not self.foi_explorado(x, y):
+                i = y * self.largura + x
+                self.explorado[i >> 3] |= 1 << (i & 7)
+                novas.append((x, y))
+        if novas: self.versao += 1
+        return novas, self.visiveis - antes
+
+    def projetar(self, cx, cy, linha, inicio, fim, xx, xy, yx, yy):
+        """Um octante do shadowcasting (inclinações de inicio até fim, a partir da linha)"""
+        if inicio < fim: return
+        raio_q = self.raio * self.raio
+        novo_inicio = inicio
+        for j in range(linha, self.raio + 1):
+            dx, dy = -j - 1, -j
+            bloqueado = False
+            while dx <= 0:
+                dx += 1
+                x, y = cx + dx * xx + dy * xy, cy + dx * yx + dy * yy
+                inclinacao_esq = (dx - 0.5) / (dy + 0.5)
+                inclinacao_dir = (dx + 0.5) / (dy - 0.5)
+                if inicio < inclinacao_dir: continue
+                if fim > inclinacao_esq: break
+
+                dentro = 0 <= x < self.largura and 0 <= y < self.altura
+                if dentro and dx * dx + dy * dy <= raio_q:
+                    self.visiveis.add((x, y))
+                opaco = not dentro or self.mapa[y][x] == 0
+                if bloqueado:
+                    if opaco:
+                        novo_inicio = inclinacao_dir
+                    else:
+                        bloqueado = False
+                        inicio = novo_inicio
+                elif opaco and j < self.raio:
+                    bloqueado = True
+                    self.projetar(cx, cy, j + 1, inicio, inclinacao_esq, xx, xy, yx, yy)
+                    novo_inicio = inclinacao_dir
+            if bloqueado: break
+
+# --- ÍNDICE ESPACIAL ---
+class GradeEspacial:
+    """Ocupação da sala por célula: (grid_x, grid_y) -> entidades ali.
+    As entidades se atualizam aqui sozinhas (Entidade.posicionar / morte do Inimigo)."""
+    def __init__(self):
+        self.celulas = {}
+        self.contagem = {} # classe -> quantas entidades dessa classe estão na grade
+
+    def adicionar(self, ent):
+        self.celulas.setdefault((ent.grid_x, ent.grid_y), []).append(ent)
+        self.contagem[type(ent)] = self.contagem.get(type(ent), 0) + 1
+        ent.grade = self
+
+    def remover(self, ent):
+        pos = (ent.grid_x, ent.grid_y)
+        lista = self.celulas[pos]
+        lista.remove(ent)
+        if not lista: del self.celulas[pos]
+        self.contagem[type(ent)] -= 1
+        ent.grade = None
+
+    def mover(self, ent, nx, ny):
+        pos = (ent.grid_x, ent.grid_y)
+        lista = self.celulas[pos]
+        lista.remove(ent)
+        if not lista: del self.celulas[pos]
+        ent.grid_x, ent.grid_y = nx, ny
+        self.celulas.setdefault((nx, ny), []).append(ent)
+
+    def em(self, x, y, classe=None):
+        lista = self.celulas.get((x, y), ())
+        return [e for e in lista if classe is None or isinstance(e, classe)]
+
+    def vizinhos(self, x, y, classe=None):
+        """Entidades na célula e nas 4 vizinhas (distância Manhattan <= 1)"""
+        achados = []
+        for pos in ((x, y), (x + 1, y), (x - 1, y), (x, y + 1), (x, y - 1)):
+            for e in self.celulas.get(pos, ()):
+                if classe is None or isinstance(e, classe):
+                    achados.append(e)
+        return achados
+
+    def bloqueada(self, pos):
+        """Tem alguém (player/inimigo) ocupando a célula? Objetos não bloqueiam."""
+        return any(not isinstance(e, ObjetoInterativo) for e in self.celulas.get(pos, ()))
+
+    def contar(self, classe):
+        return self.contagem.get(classe, 0)
+
+# --- PERFILADOR (F3 ou ROGUELIKE_PERFIL=1) ---
+SECOES_PERFIL = ['input', 'update', 'ia', 'draw', 'chao', 'entidades', 'escalar', 'ui', 'flip']
+CONTADORES_PERFIL = ['blits', 'textos']
+
+class Perfilador:
+    """Mede o tempo de cada fase/sub-etapa do quadro e conta blits e renders de texto.
+    Desligado, cada ponto de medição custa só um if. Com ROGUELIKE_PERFIL_SAIDA=arquivo.csv
+    (ou .jsonl) grava um registro por quadro pra comparar builds; o arquivo só é aberto (e zerado)
+    no primeiro quadro medido, então quem só importa o módulo não mexe nele."""
+    def __init__(self, ativo=False, saida=None, historico=120):
+        self.ativo = ativo
+        self.historico = deque(maxlen=historico) # Tempos (ms) dos últimos quadros pro gráfico
+        self.quadro = 0
+        self.caminho_saida = saida
+        self.saida = None
+        self.escritor = None
+        self.zerar()
+
+    def zerar(self):
+        self.tempos = dict.fromkeys(SECOES_PERFIL, 0.0)
+        self.contagens = dict.fromkeys(CONTADORES_PERFIL, 0)
+
+    def abrir_saida(self, caminho):
+        self.saida = open(caminho, 'w', newline='', encoding='utf-8')
+        atexit.register(self.fechar)
+        if caminho.endswith('.csv'):
+            self.escritor = csv.writer(self.saida)
+            self.escritor.writerow(['quadro'] + [f"{s}_ms" for s in SECOES_PERFIL] + CONTADORES_PERFIL)
+
+    def fechar(self):
+        if self.saida:
+            self.saida.close()
+            self.saida = self.escritor = None
+
+    def alternar(self):
+        self.ativo = not self.ativo
+        self.zerar()
+
+    def agora(self):
+        return time.perf_counter() if self.ativo else 0.0
+
+    def registrar(self, secao, inicio):
+        if self.ativo:
+            self.tempos[secao] += (time.perf_counter() - inicio) * 1000
+
+    def contar(self, contador, n=1):
+        if self.ativo:
+            self.contagens[contador] += n
+
+    def fim_quadro(self):
+        if not self.ativo: return
+        if self.caminho_saida and self.saida is None:
+            self.abrir_saida(self.caminho_saida)
+            self.caminho_saida = None # Abre uma vez só (fechar() no fim não reabre)
+        self.quadro += 1
+        self.historico.append(dict(self.tempos))
+        if self.escritor:
+            self.escritor.writerow([self.quadro] + [round(self.tempos[s], 4) for s in SECOES_PERFIL] + [self.contagens[c] for c in CONTADORES_PERFIL])
+        elif self.saida:
+            self.saida.write(json.dumps({'quadro': self.quadro, 'ms': self.tempos, **self.contagens}) + "\n")
+        self.ultimo = (dict(self.tempos), dict(self.contagens))
+        self.zerar()
+
+    def desenhar(self, tela, fonte):
+        """Gráfico rolante (input/update/draw empilhados) + números do último quadro"""
+        if not self.ativo or not self.historico: return
+        w, h = 240, 80
+        painel = pygame.Rect(LARGURA_TELA - w - 10, 10, w, h)
+        pygame.draw.rect(tela, (0, 0, 0), painel)
+        escala = h / (2000 / FPS) # Altura do painel = 2 quadros de orçamento
+        orcamento_y = painel.bottom - (1000 / FPS) * escala
+        pygame.draw.line(tela, (255, 255, 0), (painel.x, orcamento_y), (painel.right, orcamento_y))
+        largura_barra = w / self.historico.maxlen
+        for i, tempos in enumerate(self.historico):
+            x = painel.x + i * largura_barra
+            base = painel.bottom
+            for secao, cor in (('input', (120, 120, 255)), ('update', (80, 220, 80)), ('draw', (230, 80, 80))):
+                altura = min(tempos[secao] * escala, base - painel.y)
+                pygame.draw.rect(tela, cor, (x, base - altura, max(1, largura_barra), altura))
+                base -= altura
+
+        tempos, contagens = self.ultimo
+        linhas = [f"{s}: {tempos[s]:.2f}ms" for s in SECOES_PERFIL if tempos[s]]
+        linhas += [f"{c}: {contagens[c]}" for c in CONTADORES_PERFIL]
+        y = painel.bottom + 4
+        for linha in linhas:
+            tela.blit(fonte.render(linha, True, (255, 255, 0)), (painel.x, y))
+            y += 18
+
+PERFIL = Perfilador(ativo=os.environ.get('ROGUELIKE_PERFIL') == '1', saida=os.environ.get('ROGUELIKE_PERFIL_SAIDA'))
+
+# --- CACHE DE TEXTO ---
+class CacheTexto:
+    """Superfícies de texto já renderizadas, chave (fonte, texto, cor), com descarte LRU"""
+    def __init__(self, maximo=MAX_TEXTOS_CACHE):
+        self.maximo = maximo
+        self.surfs = OrderedDict()
+
+    def render(self, fonte, texto, cor):
+        chave = (fonte, texto, cor)
+        surf = self.surfs.get(chave)
+        if surf is not None:
+            self.surfs.move_to_end(chave)
+            return surf
+        surf = fonte.render(texto, True, cor)
+        PERFIL.contar('textos')
+        self.surfs[chave] = surf
+        if len(self.surfs) > self.maximo:
+            self.surfs.popitem(last=False)
+        return surf
+
 # --- ENTIDADES ---
 class Entidade:
     def __init__(self, grid_x, grid_y, nome):
@@ -140,17 +902,42 @@ class Entidade:
         self.visual_x, self.visual_y = self.cart_para_iso(grid_x, grid_y)
         self.nome = nome
         self.vivo = True
+        self.grade = None # GradeEspacial da sala (se estiver em uma)
+        self.camada = None # CamadaRender onde é desenhada
+        self.animador = None # Só quem tem sprite animado
+
+    CAMADA = 'atores'
+    BARRA_VIDA = False
 
-    def cart_para_iso(self, x, y):
+    def posicionar(self, x, y):
+        """Muda de célula mantendo o índice espacial e a ordem de desenho em dia"""
+        if self.animador: self.animador.olhar(x - self.grid_x, y - self.grid_y)
+        if self.grade: self.grade.mover(self, x, y)
+        else: self.grid_x, self.grid_y = x, y
+        if self.camada: self.camada.reposicionar(self)
+
+    def aparece(self, visao):
+        return True
+
+    @staticmethod
+    def cart_para_iso(x, y):
         iso_x = (x - y) * (TILE_W / 2)
         iso_y = (x + y) * (TILE_H / 2)
         return iso_x, iso_y
 
-    def update_visual(self):
+    @staticmethod
+    def iso_para_cart(iso_x, iso_y):
+        """Inverso do cart_para_iso (resultado em float, sem arredondar)"""
+        a = iso_x / (TILE_W / 2)
+        b = iso_y / (TILE_H / 2)
+        return (a + b) / 2, (b - a) / 2
+
+    def update_visual(self, dt=1 / FPS):
         # Move o visual suavemente até o grid
         alvo_x, alvo_y = self.cart_para_iso(self.grid_x, self.grid_y)
-        self.visual_x += (alvo_x - self.visual_x) * 0.2
-        self.visual_y += (alvo_y - self.visual_y) * 0.2
+        fator = suavizar(0.2, dt)
+        self.visual_x += (alvo_x - self.visual_x) * fator
+        self.visual_y += (alvo_y - self.visual_y) * fator
 
 class Player(Entidade):
     def __init__(self, x, y):
@@ -168,16 +955,22 @@ class Player(Entidade):
         self.inventario = []
         self.arma_equipada = {"nome": "Adaga", "dano": 3, "tipo": "arma"}
         self.cooldown_ataque = 0
+        self.animador = Animador('player')
+
+    def aparencia(self):
+        """(chave do sprite, cor e forma do fallback)"""
+        return self.animador.chave_quadro(), CORES['player'], 'circulo'
 
     def mover(self, dx, dy, mapa):
         nx, ny = self.grid_x + dx, self.grid_y + dy
         if 0 <= ny < len(mapa) and 0 <= nx < len(mapa[0]):
             if mapa[ny][nx] != 0: # 0 é parede
-                self.grid_x, self.grid_y = nx, ny
+                self.posicionar(nx, ny)
 
     def atacar(self, inimigos):
         if self.cooldown_ataque > 0: return None
         self.cooldown_ataque = 30
+        self.animador.tocar('ataque')
         
         dano_total = self.arma_equipada['dano'] + self.forca
         msg = "Errou!"
@@ -192,8 +985,29 @@ class Player(Entidade):
                     self.xp += ini.xp_drop
         return msg
 
+def coluna_armazem(nome, tipo):
+    """Property que lê/escreve a linha da entidade numa coluna do ArmazemInimigos"""
+    def ler(self):
+        return tipo(getattr(self.armazem, nome)[self.idx])
+    def escrever(self, valor):
+        getattr(self.armazem, nome)[self.idx] = valor
+    return property(ler, escrever)
+
 class Inimigo(Entidade):
-    def __init__(self, x, y, nome, stats, boss=False):
+    # Os dados quentes moram em colunas NumPy (ArmazemInimigos); o objeto é só uma "view"
+    grid_x = coluna_armazem('grid_x', int)
+    grid_y = coluna_armazem('grid_y', int)
+    visual_x = coluna_armazem('visual_x', float)
+    visual_y = coluna_armazem('visual_y', float)
+    vida = coluna_armazem('vida', int)
+    vida_max = coluna_armazem('vida_max', int)
+    dano = coluna_armazem('dano', int)
+    velocidade = coluna_armazem('velocidade', int)
+    vivo = coluna_armazem('vivo', bool)
+
+    def __init__(self, x, y, nome, stats, boss=False, armazem=None):
+        self.armazem = armazem if armazem is not None else ArmazemInimigos()
+        self.idx = self.armazem.reservar(self)
         super().__init__(x, y, nome)
         # CORREÇÃO 1: Adicionando vida_max para a barra funcionar
         self.vida_max = stats['vida'] 
@@ -201,47 +1015,427 @@ class Inimigo(Entidade):
         self.dano = stats['dano']
         self.xp_drop = stats['xp']
         self.boss = boss
-        self.timer_acao = 0
-        self.velocidade = 60 if not boss else 45
-
-    def update_ia(self, player):
-        if not self.vivo: return
-        self.timer_acao += 1
-        if self.timer_acao >= self.velocidade:
-            self.timer_acao = 0
-            dist = abs(self.grid_x - player.grid_x) + abs(self.grid_y - player.grid_y)
-            
-            if dist <= 1: # Atacar
-                player.vida -= self.dano
-            else: # Perseguir
-                dx = 1 if player.grid_x > self.grid_x else -1 if player.grid_x < self.grid_x else 0
-                dy = 1 if player.grid_y > self.grid_y else -1 if player.grid_y < self.grid_y else 0
-                self.grid_x += dx
-                if dx == 0: self.grid_y += dy
+        self.velocidade = 60 if not boss else 45 # Ticks entre um turno e outro (ver Agenda)
+        self.dormindo = True # Fora da agenda até entrar no campo de visão do player
+        self.animador = Animador('boss' if boss else 'inimigo')
+
+    BARRA_VIDA = True
+
+    def aparece(self, visao):
+        return self.vivo and visao.visivel(self.grid_x, self.grid_y)
+
+    def aparencia(self):
+        return self.animador.chave_quadro(), CORES['boss'] if self.boss else CORES['inimigo'], 'circulo'
+
+    def perseguir(self, campo, grade):
+        # Perseguir pelo flow field (desvia de paredes e de outros inimigos)
+        passo = campo.proximo_passo(self.grid_x, self.grid_y, grade.bloqueada)
+        if passo:
+            self.posicionar(*passo)
 
     def tomar_dano(self, quant):
         self.vida -= quant
-        if self.vida <= 0: self.vivo = False
+        if self.vida <= 0 and self.vivo:
+            self.vivo = False
+            if self.grade: self.grade.remover(self)
+            if self.camada: self.camada.remover(self)
 
 class ObjetoInterativo(Entidade):
+    CAMADA = 'objetos'
+
     def __init__(self, x, y, tipo, dados):
         super().__init__(x, y, tipo)
         self.tipo = tipo # 'bau', 'fonte', 'portal'
         self.dados = dados
         self.ativo = True
 
+    def aparece(self, visao):
+        return (self.ativo or self.tipo == 'portal') and visao.foi_explorado(self.grid_x, self.grid_y)
+
+    def aparencia(self):
+        cor = CORES[self.tipo]
+        if self.tipo == 'portal' and not self.ativo: cor = (50,0,0) # Trancado
+        return self.tipo, cor, 'retangulo'
+
+# --- ARMAZÉM DE INIMIGOS (STRUCTURE OF ARRAYS) ---
+class ArmazemInimigos:
+    """Estado dos inimigos da sala em colunas NumPy (uma linha por inimigo).
+    A interpolação visual roda em lote, sem loop Python (os turnos ficam na Agenda)."""
+    COLUNAS = {
+        'grid_x': np.int32, 'grid_y': np.int32,
+        'visual_x': np.float64, 'visual_y': np.float64,
+        'vida': np.int32, 'vida_max': np.int32, 'dano': np.int32,
+        'velocidade': np.int32,
+        'vivo': np.bool_,
+    }
+
+    def __init__(self, capacidade=16):
+        self.n = 0
+        self.inimigos = [] # Views (Inimigo) na mesma ordem das linhas
+        for nome, tipo in self.COLUNAS.items():
+            setattr(self, nome, np.zeros(capacidade, dtype=tipo))
+
+    def reservar(self, inimigo):
+        """Reserva uma linha pro inimigo (dobra as colunas quando enche)"""
+        if self.n == len(self.vivo):
+            for nome in self.COLUNAS:
+                coluna = getattr(self, nome)
+                nova = np.zeros(len(coluna) * 2, dtype=coluna.dtype)
+                nova[:self.n] = coluna[:self.n]
+                setattr(self, nome, nova)
+        idx = self.n
+        self.n += 1
+        self.vivo[idx] = True
+        self.inimigos.append(inimigo)
+        return idx
+
+    def atualizar_visual(self, dt=1 / FPS):
+        # Mesmo lerp do Entidade.update_visual, pra todos de uma vez
+        n = self.n
+        gx, gy = self.grid_x[:n], self.grid_y[:n]
+        alvo_x = (gx - gy) * (TILE_W / 2)
+        alvo_y = (gx + gy) * (TILE_H / 2)
+        fator = suavizar(0.2, dt)
+        self.visual_x[:n] += (alvo_x - self.visual_x[:n]) * fator
+        self.visual_y[:n] += (alvo_y - self.visual_y[:n]) * fator
+
+# --- AGENDA DE AÇÕES (HEAP) ---
+# Ações que podem ir pra agenda; o Game trata cada uma em acao_<nome>
+ACOES_AGENDA = ['turno', 'golpe']
+
+class Agenda:
+    """Fila de prioridade (tick, seq, entidade, ação): cada tick só processa quem está na vez.
+    Velocidades diferentes, lentidão/atordoamento e ações atrasadas (golpe do boss) são só
+    o atraso passado pro agendar. seq desempata na ordem de agendamento (determinístico)."""
+    def __init__(self):
+        self.heap = []
+        self.seq = 0
+        self.agora = 0 # Só anda em STATE_PLAY (pausa/inventário não gastam turnos)
+
+    def agendar(self, atraso, entidade, acao='turno'):
+        heapq.heappush(self.heap, (self.agora + atraso, self.seq, entidade, acao))
+        self.seq += 1
+
+    def avancar(self):
+        """Passa um tick e entrega, em ordem, as ações que venceram"""
+        self.agora += 1
+        while self.heap and self.heap[0][0] <= self.agora:
+            _, _, entidade, acao = heapq.heappop(self.heap)
+            yield entidade, acao
+
+    def pendentes(self):
+        """(ticks que faltam, entidade, ação) na ordem em que vão sair"""
+        return [(tick - self.agora, entidade, acao) for tick, _, entidade, acao in sorted(self.heap)]
+
+# --- GERAÇÃO PROCEDURAL (BSP) ---
+MODELOS_INIMIGOS = [
+    {'nome': 'Slime', 'vida': 20, 'dano': 2, 'xp': 10},
+    {'nome': 'Goblin', 'vida': 30, 'dano': 5, 'xp': 20},
+]
+MODELO_BOSS = {'nome': 'REI ORC', 'vida': 150, 'dano': 12, 'xp': 500, 'boss': True}
+ITENS_BAU = [
+    {'nome': 'Espada Longa', 'dano': 8, 'tipo': 'arma'},
+    {'nome': 'Machado', 'dano': 10, 'tipo': 'arma'},
+    {'nome': 'Lança', 'dano': 7, 'tipo': 'arma'},
+]
+
+class GeradorMasmorra:
+    """Gera salas no mesmo formato do criar_salas (mapa, tipo, inimigos, obj) + spawn/portal.
+    Determinístico: a mesma seed e o mesmo índice sempre geram a mesma sala."""
+    TAM_MIN_FOLHA = 8
+
+    def __init__(self, seed, tamanho=TAM_SALA_PROCEDURAL):
+        self.seed = seed
+        self.largura, self.altura = tamanho
+
+    def gerar_sala(self, indice, tipo):
+        rng = random.Random(f"{self.seed}:{indice}")
+        mapa, comodos = self.gerar_mapa(rng)
+        spawn = self.centro(comodos[0])
+        dist = self.distancias(mapa, spawn)
+        # Portal na célula alcançável mais longe do spawn
+        portal = max(dist, key=dist.get)
+
+        livres = [pos for pos, d in dist.items() if d >= 3 and pos != portal]
+        rng.shuffle(livres)
+        sala = {'mapa': mapa, 'tipo': tipo, 'inimigos': [], 'obj': [], 'spawn': spawn, 'portal': portal}
+
+        if tipo == 'combate':
+            n = max(1, min(len(livres) // 60, 4 + indice * 2))
+            for _ in range(n):
+                modelo = MODELOS_INIMIGOS[min(len(MODELOS_INIMIGOS) - 1, rng.randrange(indice + 1))]
+                sala['inimigos'].append(dict(modelo, pos=livres.pop()))
+        elif tipo == 'boss':
+            vizinhas = sorted(livres, key=lambda pos: abs(pos[0] - portal[0]) + abs(pos[1] - portal[1]))
+            sala['inimigos'].append(dict(MODELO_BOSS, pos=vizinhas[0]))
+        elif tipo == 'tesouro':
+            sala['obj'].append({'tipo': 'bau', 'pos': livres.pop(), 'item': dict(rng.choice(ITENS_BAU))})
+        elif tipo == 'fonte':
+            sala['obj'].append({'tipo': 'fonte', 'pos': livres.pop(), 'buff': 'vida_full'})
+        return sala
+
+    def gerar_mapa(self, rng):
+        # 0: Parede, 1: Chão
+        mapa = [[0] * self.largura for _ in range(self.altura)]
+        folhas = self.dividir(rng, 1, 1, self.largura - 2, self.altura - 2)
+        comodos = []
+        for x, y, w, h in folhas:
+            cw = rng.randint(min(w, 4), w)
+            ch = rng.randint(min(h, 4), h)
+            cx = x + rng.randint(0, w - cw)
+            cy = y + rng.randint(0, h - ch)
+            for yy in range(cy, cy + ch):
+                mapa[yy][cx:cx + cw] = [1] * cw
+            comodos.append((cx, cy, cw, ch))
+        # As folhas saem na ordem da árvore: ligar vizinhas na lista liga irmãs -> tudo conectado
+        for a, b in zip(comodos, comodos[1:]):
+            self.corredor(rng, mapa, self.centro(a), self.centro(b))
+        return mapa, comodos
+
+    def dividir(self, rng, x, y, w, h):
+        """BSP: divide o retângulo até as folhas ficarem pequenas"""
+        pode_v = w >= self.TAM_MIN_FOLHA * 2
+        pode_h = h >= self.TAM_MIN_FOLHA * 2
+        if not (pode_v or pode_h):
+            return [(x, y, w, h)]
+        vertical = pode_v and (not pode_h or w > h or (w == h and rng.random() < 0.5))
+        if vertical:
+            corte = rng.randint(self.TAM_MIN_FOLHA, w - self.TAM_MIN_FOLHA)
+            return self.dividir(rng, x, y, corte, h) + self.dividir(rng, x + corte, y, w - corte, h)
+        corte = rng.randint(self.TAM_MIN_FOLHA, h - self.TAM_MIN_FOLHA)
+        return self.dividir(rng, x, y, w, corte) + self.dividir(rng, x, y + corte, w, h - corte)
+
+    @staticmethod
+    def centro(comodo):
+        x, y, w, h = comodo
+        return x + w // 2, y + h // 2
+
+    @staticmethod
+    def corredor(rng, mapa, a, b):
+        (ax, ay), (bx, by) = a, b
+        # Corredor em L (sorteia se vai primeiro na horizontal ou na vertical)
+        canto = (bx, ay) if rng.random() < 0.5 else (ax, by)
+        for (x0, y0), (x1, y1) in ((a, canto), (canto, b)):
+            for x in range(min(x0, x1), max(x0, x1) + 1):
+                mapa[y0][x] = 1
+            for y in range(min(y0, y1), max(y0, y1) + 1):
+                mapa[y][x0] = 1
+
+    @staticmethod
+    def distancias(mapa, origem):
+        dist = {origem: 0}
+        fronteira = [origem]
+        while fronteira:
+            proxima = []
+            for x, y in fronteira:
+                for dx, dy in CampoFluxo.VIZINHOS:
+                    pos = (x + dx, y + dy)
+                    if pos not in dist and mapa[pos[1]][pos[0]] != 0: # Borda é sempre parede
+                        dist[pos] = dist[(x, y)] + 1
+                        proxima.append(pos)
+            fronteira = proxima
+        return dist
+
+# --- SNAPSHOTS (SAVE/LOAD) ---
+# Formato binário little-endian, versionado. Guarda só o que muda durante a partida;
+# mapa e stats dos inimigos vêm da definição da sala (o mapa só vai junto se foi alterado).
+MAGICA_SNAPSHOT = b'RLSV'
+VERSAO_SNAPSHOT = 4
+ARQUIVO_SAVE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "save.rlsv")
+
+CABECALHO_SNAPSHOT = struct.Struct('<4sHQBHBHH') # mágica, versão, seed, procedural, sala, estado, largura/altura da sala
+PLAYER_SNAPSHOT = struct.Struct('<HHiiiiiiii') # grid x/y, vida, vida_max, forca, destreza, vitalidade, xp, nivel, cooldown
+INIMIGO_SNAPSHOT = struct.Struct('<HHiB') # grid x/y, vida, vivo
+AGENDA_SNAPSHOT = struct.Struct('<IHB') # ticks que faltam, índice do inimigo, ação
+
+class EscritorBinario:
+    def __init__(self):
+        self.partes = []
+
+    def struct(self, formato, *valores):
+        self.partes.append(formato.pack(*valores))
+
+    def valores(self, fmt, *valores):
+        self.partes.append(struct.pack('<' + fmt, *valores))
+
+    def texto(self, texto):
+        dados = texto.encode('utf-8')
+        self.valores('H', len(dados))
+        self.partes.append(dados)
+
+    def item(self, item):
+        self.texto(item['nome'])
+        self.valores('i', item['dano'])
+        self.texto(item['tipo'])
+
+    def bytes(self):
+        return b''.join(self.partes)
+
+class LeitorBinario:
+    def __init__(self, dados):
+        self.dados = dados
+        self.pos = 0
+
+    def struct(self, formato):
+        valores = formato.unpack_from(self.dados, self.pos)
+        self.pos += formato.size
+        return valores
+
+    def valores(self, fmt):
+        valores = struct.unpack_from('<' + fmt, self.dados, self.pos)
+        self.pos += struct.calcsize('<' + fmt)
+        return valores
+
+    def texto(self):
+        n, = self.valores('H')
+        return self.bruto(n).decode('utf-8')
+
+    def item(self):
+        nome = self.texto()
+        dano, = self.valores('i')
+        return {'nome': nome, 'dano': dano, 'tipo': self.texto()}
+
+    def bruto(self, n):
+        if self.pos + n > len(self.dados): raise ValueError("Snapshot cortado")
+        dados = self.dados[self.pos:self.pos + n]
+        self.pos += n
+        return dados
+
+    def fim(self):
+        if self.pos != len(self.dados): raise ValueError("Snapshot com bytes sobrando")
+
+# --- GRAVAÇÃO / REPLAY ---
+# Arquivo: cabeçalho (seed + opções do jogo), save do disco no início (F9 antes de um F5 carrega ele),
+# eventos (delta de tick em varint + código da ação) e rodapé (marca FIM_EVENTOS + total de ticks +
+# SHA-1 do snapshot final, pro replay conferir se deu o mesmo resultado).
+# Os eventos vão pro disco na hora: se o jogo morrer sem rodapé, o replay ainda roda o que foi gravado.
+MAGICA_REPLAY = b'RLRP'
+VERSAO_REPLAY = 3
+FIM_EVENTOS = 0xFF # No lugar do código da ação: daqui pra frente é o rodapé
+CABECALHO_REPLAY = struct.Struct('<4sHQBHH') # mágica, versão, seed, procedural, largura/altura da sala
+RODAPE_REPLAY = struct.Struct('<Q20s') # total de ticks, hash do estado final
+
+def escrever_varint(partes, n):
+    while n >= 0x80:
+        partes.append(0x80 | (n & 0x7F))
+        n >>= 7
+    partes.append(n)
+
+def ler_varint(dados, pos):
+    n = deslocamento = 0
+    while True:
+        byte = dados[pos]
+        pos += 1
+        n |= (byte & 0x7F) << deslocamento
+        if byte < 0x80: return n, pos
+        deslocamento += 7
+
+def hash_estado(jogo):
+    return hashlib.sha1(jogo.salvar_estado()).digest()
+
+class Gravador:
+    """Grava a seed e as ações (com o tick em que entraram) vindas do Game.input"""
+    def __init__(self, caminho, jogo):
+        opcoes = jogo.opcoes
+        save = jogo.ler_save()
+        self.arquivo = open(caminho, 'wb')
+        self.arquivo.write(CABECALHO_REPLAY.pack(MAGICA_REPLAY, VERSAO_REPLAY, jogo.seed, opcoes['procedural'], *opcoes['tamanho_sala']))
+        self.arquivo.write(struct.pack('<BI', save is not None, len(save or b'')) + (save or b''))
+        self.arquivo.flush()
+        self.ultimo_tick = jogo.tick
+
+    def registrar(self, tick, acao):
+        partes = []
+        escrever_varint(partes, tick - self.ultimo_tick)
+        partes.append(CODIGOS_ACOES.index(acao))
+        self.arquivo.write(bytes(partes))
+        self.arquivo.flush() # Uma tecla por vez: barato, e nada se perde se o jogo cair
+        self.ultimo_tick = tick
+
+    def finalizar(self, jogo):
+        """Fecha com o rodapé (chamado no QUIT e no finally do run; a segunda vez não faz nada)"""
+        if self.arquivo is None: return
+        try:
+            self.arquivo.write(bytes([0, FIM_EVENTOS]) + RODAPE_REPLAY.pack(jogo.tick, hash_estado(jogo)))
+        finally:
+            # Estado quebrado demais até pro snapshot: fica a gravação sem rodapé, que ainda reproduz
+            self.arquivo.close()
+            self.arquivo = None
+
+def ler_gravacao(caminho):
+    """Lê um replay: (opções do Game, save inicial ou None, {tick: [ações]}, total de ticks, hash final).
+    Sem rodapé (jogo caiu), o hash é None e o total vai até o último evento gravado."""
+    with open(caminho, 'rb') as f:
+        dados = f.read()
+    magica, versao, seed, procedural, largura, altura = CABECALHO_REPLAY.unpack_from(dados)
+    if magica != MAGICA_REPLAY or versao != VERSAO_REPLAY:
+        raise ValueError(f"Replay inválido (versão {versao})")
+    pos = CABECALHO_REPLAY.size
+    tem_save, tamanho = struct.unpack_from('<BI', dados, pos)
+    pos += 5
+    save = dados[pos:pos + tamanho] if tem_save else None
+    pos += tamanho
+    eventos = {}
+    tick = 0
+    total = hash_final = None
+    while pos < len(dados):
+        try:
+            delta, pos = ler_varint(dados, pos)
+            codigo = dados[pos]
+        except IndexError:
+            break # Cortado no meio de um evento
+        pos += 1
+        if codigo == FIM_EVENTOS:
+            if pos + RODAPE_REPLAY.size <= len(dados):
+                total, hash_final = RODAPE_REPLAY.unpack_from(dados, pos)
+            break
+        tick += delta
+        eventos.setdefault(tick, []).append(CODIGOS_ACOES[codigo])
+    if total is None: total = tick + 1 if eventos else 0
+    opcoes = {'procedural': bool(procedural), 'seed': seed, 'tamanho_sala': (largura, altura)}
+    return opcoes, save, eventos, total, hash_final
+
 # --- MOTOR DO JOGO ---
 class Game:
-    def __init__(self):
-        pygame.init()
-        self.tela = pygame.display.set_mode((LARGURA_TELA, ALTURA_TELA))
-        pygame.display.set_caption("Roguelike Isométrico Completo")
-        self.clock = pygame.time.Clock()
-        self.fonte = pygame.font.SysFont('Consolas', 18)
-        self.fonte_grande = pygame.font.SysFont('Verdana', 32, bold=True)
+    def __init__(self, headless=False, procedural=False, seed=None, tamanho_sala=TAM_SALA_PROCEDURAL,
+                 modo_dirty=os.environ.get('ROGUELIKE_DIRTY') == '1', gravar=os.environ.get('ROGUELIKE_GRAVAR'),
+                 arquivo_save=ARQUIVO_SAVE):
+        # headless: só a lógica roda (sem janela, sem fontes, sem sprites, sem clock).
+        # O jogo avança chamando step(acoes) em vez de run().
+        # procedural: salas geradas (BSP) a partir da seed, em vez das 5 salas fixas.
+        # modo_dirty: só redesenha (e manda pro display) as regiões que mudaram desde o último quadro
+        # gravar: caminho do arquivo de replay (seed + ações por tick), escrito ao fechar o jogo
+        # arquivo_save: onde F5/F9 salvam/carregam; None = só na memória (o replay não mexe no save do disco)
+        self.opcoes = {'headless': headless, 'procedural': procedural, 'seed': seed, 'tamanho_sala': tamanho_sala, 'modo_dirty': modo_dirty}
+        self.headless = headless
+        self.modo_dirty = modo_dirty
+        self.retrato_anterior = None
+        self.arquivo_save = arquivo_save
+        self.save_memoria = None
+        if headless:
+            self.tela = None
+            self.clock = None
+            self.fonte = self.fonte_grande = None
+        else:
+            pygame.init()
+            self.tela = pygame.display.set_mode((LARGURA_TELA, ALTURA_TELA))
+            pygame.display.set_caption("Roguelike Isométrico Completo")
+            self.clock = pygame.time.Clock()
+            self.fonte = pygame.font.SysFont('Consolas', 18)
+            self.fonte_grande = pygame.font.SysFont('Verdana', 32, bold=True)
+        self.textos = CacheTexto()
+        self.hud_chave = self.hud_surf = None
+        self.overlay_escuro = None # Fundo do inventário (criado uma vez só)
+        # O mundo é desenhado na escala escolhida e esticado pra janela; a UI fica na resolução cheia
+        self.resolucao = ResolucaoAdaptativa(escala_fixa())
+        self.tela_mundo = None
         
-        self.assets = AssetManager()
+        self.assets = AssetManager(carregar=not headless)
         self.camera = Camera(LARGURA_TELA, ALTURA_TELA)
+        self.visao = CampoVisao()
+        self.chao = CamadaChao(self.assets, self.visao)
+        self.fila = FilaRender(self.assets)
+        self.campo = CampoFluxo()
         
         # Estados
         self.STATE_MENU = 0
@@ -250,15 +1444,211 @@ class Game:
         self.STATE_INVENTORY = 3
         self.STATE_GAMEOVER = 4
         self.STATE_WIN = 5
-        self.estado_atual = self.STATE_MENU
+        self.ESTADOS = (self.STATE_MENU, self.STATE_PLAY, self.STATE_PAUSE, self.STATE_INVENTORY, self.STATE_GAMEOVER, self.STATE_WIN)
         
+        # Uma thread gera a próxima sala enquanto o player ainda está na atual
+        self.executor = ThreadPoolExecutor(max_workers=1) if procedural else None
+        self.gerador = None
+        self.salas = []
+        self.salas_futuras = {}
+        self.tick = 0 # Quantas vezes update() rodou (a lógica só depende disso, nunca do relógio)
+        self.novo_jogo(seed)
+        self.gravador = Gravador(gravar, self) if gravar else None
+
+    def novo_jogo(self, seed=None, sala=0):
+        """Zera a partida sem mexer em display/assets (início, reiniciar e load usam isso)"""
+        seed = seed if seed is not None else random.randrange(2**32)
+        self.estado_atual = self.STATE_MENU
         self.player = Player(2, 2)
         self.sala_atual_idx = 0
-        self.salas = []
         self.log_msgs = []
-        
-        self.criar_salas()
-        self.carregar_sala(0)
+        self.retrato_anterior = None
+
+        if self.opcoes['procedural']:
+            if self.gerador is None or self.gerador.seed != seed:
+                for futuro in self.salas_futuras.values(): futuro.cancel()
+                self.gerador = GeradorMasmorra(seed, self.opcoes['tamanho_sala'])
+                self.salas = [None] * len(TIPOS_SALAS)
+                self.salas_futuras = {}
+            else:
+                # Mesma seed: reaproveita as salas já geradas (menos as que tiveram tiles alterados)
+                self.salas = [None if sala_gerada and sala_gerada.get('modificada') else sala_gerada for sala_gerada in self.salas]
+                for sala_gerada in self.salas:
+                    if sala_gerada: sala_gerada.pop('explorado', None) # Névoa volta
+        else:
+            self.criar_salas()
+        self.seed = seed
+        self.carregar_sala(sala)
+
+    def reiniciar(self):
+        # Instantâneo: não reinicia pygame/display nem recarrega sprites.
+        # A próxima seed sai da atual (nunca do relógio), então o replay reinicia na mesma masmorra
+        self.novo_jogo(random.Random(self.seed).randrange(2**32))
+
+    def pre_gerar_sala(self, indice):
+        """Agenda a geração da sala na thread de fundo (se ainda não existe)"""
+        if indice < len(self.salas) and self.salas[indice] is None and indice not in self.salas_futuras:
+            self.salas_futuras[indice] = self.executor.submit(self.gerador.gerar_sala, indice, TIPOS_SALAS[indice])
+
+    def obter_sala(self, indice):
+        if self.salas[indice] is None:
+            self.pre_gerar_sala(indice)
+            # Normalmente já terminou (foi pedida ao entrar na sala anterior)
+            self.salas[indice] = self.salas_futuras.pop(indice).result()
+        return self.salas[indice]
+
+    # --- SAVE / LOAD ---
+    def tamanho_sala(self, indice):
+        """(largura, altura) da sala indice, sem precisar gerar ela"""
+        if self.gerador is not None: return tuple(self.opcoes['tamanho_sala'])
+        mapa = self.salas[indice]['mapa']
+        return len(mapa[0]), len(mapa)
+
+    def salvar_estado(self):
+        """Snapshot compacto da partida (bytes)"""
+        p = self.player
+        w = EscritorBinario()
+        w.struct(CABECALHO_SNAPSHOT, MAGICA_SNAPSHOT, VERSAO_SNAPSHOT, self.seed, self.gerador is not None, self.sala_atual_idx, self.estado_atual,
+                 len(self.mapa_atual[0]), len(self.mapa_atual))
+        w.struct(PLAYER_SNAPSHOT, p.grid_x, p.grid_y, p.vida, p.vida_max, p.forca, p.destreza, p.vitalidade, p.xp, p.nivel, p.cooldown_ataque)
+        w.item(p.arma_equipada)
+        w.valores('H', len(p.inventario))
+        for item in p.inventario: w.item(item)
+
+        w.valores('H', len(self.inimigos))
+        for ini in self.inimigos:
+            w.struct(INIMIGO_SNAPSHOT, ini.grid_x, ini.grid_y, ini.vida, ini.vivo)
+        pendentes = self.agenda.pendentes()
+        w.valores('I', len(pendentes))
+        for falta, ini, acao in pendentes:
+            w.struct(AGENDA_SNAPSHOT, falta, ini.idx, ACOES_AGENDA.index(acao))
+        w.valores('H', len(self.objetos))
+        for obj in self.objetos:
+            w.valores('B', obj.ativo)
+
+        w.valores('B', len(self.log_msgs))
+        for msg in self.log_msgs: w.texto(msg)
+
+        # Mapa só vai junto se a sala foi alterada (alterar_tile)
+        modificada = bool(self.sala_atual.get('modificada'))
+        w.valores('B', modificada)
+        if modificada:
+            altura, largura = len(self.mapa_atual), len(self.mapa_atual[0])
+            w.valores('HH', largura, altura)
+            w.partes.append(bytes(tile for linha in self.mapa_atual for tile in linha))
+
+        # Névoa de guerra: bitset das células já vistas
+        w.valores('I', len(self.visao.explorado))
+        w.partes.append(bytes(self.visao.explorado))
+        return w.bytes()
+
+    def carregar_estado(self, dados):
+        """Restaura um snapshot de salvar_estado (não toca em display nem assets)"""
+        r = LeitorBinario(dados)
+        magica, versao, seed, procedural, sala, estado, largura, altura = r.struct(CABECALHO_SNAPSHOT)
+        if magica != MAGICA_SNAPSHOT or versao != VERSAO_SNAPSHOT:
+            raise ValueError(f"Snapshot inválido (versão {versao})")
+        if bool(procedural) != (self.gerador is not None):
+            raise ValueError("Snapshot de outro modo de jogo (procedural x salas fixas)")
+        if sala >= len(TIPOS_SALAS) or estado not in self.ESTADOS:
+            raise ValueError(f"Snapshot com sala/estado inválido ({sala}, {estado})")
+        if (largura, altura) != self.tamanho_sala(sala):
+            raise ValueError(f"Snapshot de sala {largura}x{altura}, diferente da deste jogo")
+
+        # Lê e confere tudo antes de mexer na partida: save cortado/corrompido não pode zerar a run atual
+        player = r.struct(PLAYER_SNAPSHOT)
+        arma = r.item()
+        n, = r.valores('H')
+        inventario = [r.item() for _ in range(n)]
+        n, = r.valores('H')
+        inimigos = [r.struct(INIMIGO_SNAPSHOT) for _ in range(n)]
+        n, = r.valores('I')
+        agenda = [r.struct(AGENDA_SNAPSHOT) for _ in range(n)]
+        n, = r.valores('H')
+        objetos = [bool(r.valores('B')[0]) for _ in range(n)]
+        n, = r.valores('B')
+        log_msgs = [r.texto() for _ in range(n)]
+        mapa = None
+        if r.valores('B')[0]:
+            if r.valores('HH') != (largura, altura): raise ValueError("Snapshot com mapa de outro tamanho")
+            tiles = r.bruto(largura * altura)
+            mapa = [tiles[y * largura:(y + 1) * largura] for y in range(altura)]
+        n, = r.valores('I')
+        if n != (largura * altura + 7) // 8: raise ValueError("Snapshot com névoa de outro tamanho")
+        explorado = r.bruto(n)
+        r.fim()
+        if any(idx >= len(inimigos) or acao >= len(ACOES_AGENDA) for _, idx, acao in agenda):
+            raise ValueError("Snapshot com agenda inválida")
+
+        self.novo_jogo(seed, sala)
+        p = self.player
+        gx, gy, p.vida, p.vida_max, p.forca, p.destreza, p.vitalidade, p.xp, p.nivel, p.cooldown_ataque = player
+        p.posicionar(gx, gy)
+        p.arma_equipada = arma
+        p.inventario = inventario
+
+        for ini, (gx, gy, vida, vivo) in zip(self.inimigos, inimigos):
+            ini.vida = vida
+            ini.posicionar(gx, gy)
+            if not vivo:
+                ini.vivo = False
+                self.grade.remover(ini)
+                self.fila.camadas[ini.CAMADA].remover(ini)
+        self.agenda = Agenda()
+        for ini in self.inimigos: ini.dormindo = True # Quem está acordado é quem tem turno na agenda
+        for falta, idx, acao in agenda:
+            ini = self.inimigos[idx]
+            ini.dormindo = False
+            self.agenda.agendar(falta, ini, ACOES_AGENDA[acao])
+        for obj, ativo in zip(self.objetos, objetos):
+            obj.ativo = ativo
+        self.log_msgs = log_msgs
+
+        if mapa:
+            for linha_atual, linha in zip(self.mapa_atual, mapa):
+                linha_atual[:] = linha
+            self.versao_mapa += 1
+            self.sala_atual['modificada'] = True
+
+        self.visao.explorado[:] = explorado
+        self.visao.versao += 1
+        self.chao.definir_mapa(self.mapa_atual) # Chunks cacheados ainda estavam com a névoa antiga
+        self.atualizar_visao()
+
+        # Sem deslizar: visual e câmera já começam no lugar
+        for ent in [p] + self.inimigos:
+            ent.visual_x, ent.visual_y = ent.cart_para_iso(ent.grid_x, ent.grid_y)
+        self.camera.camera.update(-p.visual_x + int(LARGURA_TELA / 2), -p.visual_y + int(ALTURA_TELA / 2))
+        self.estado_atual = estado
+
+    def ler_save(self):
+        """Bytes do save atual (disco ou memória), None se não tem"""
+        if self.arquivo_save is None: return self.save_memoria
+        try:
+            with open(self.arquivo_save, 'rb') as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def salvar_arquivo(self):
+        dados = self.salvar_estado()
+        if self.arquivo_save is None:
+            self.save_memoria = dados
+        else:
+            # Arquivo temporário + os.replace: cair no meio do F5 não deixa save cortado
+            temporario = f"{self.arquivo_save}.tmp"
+            with open(temporario, 'wb') as f:
+                f.write(dados)
+            os.replace(temporario, self.arquivo_save)
+        self.log("Jogo salvo.")
+
+    def carregar_arquivo(self):
+        try:
+            dados = self.ler_save()
+            if dados is None: raise ValueError("nenhum jogo salvo")
+            self.carregar_estado(dados)
+        except (OSError, ValueError, struct.error) as e:
+            self.log(f"Não deu pra carregar: {e}")
 
     def criar_salas(self):
         # 0: Parede, 1: Chão
@@ -274,28 +1664,29 @@ class Game:
         ]
         
         # Sala 1: Tutorial/Básica
-        s1 = {'mapa': layout_padrao, 'tipo': 'combate', 'inimigos': [
+        # Cada sala tem sua própria cópia do layout (alterar_tile não pode vazar pras outras)
+        s1 = {'mapa': [linha[:] for linha in layout_padrao], 'tipo': 'combate', 'inimigos': [
             {'nome': 'Slime', 'vida': 20, 'dano': 2, 'xp': 10, 'pos': (4,4)}
         ], 'obj': []}
         
         # Sala 2: Combate Médio
-        s2 = {'mapa': layout_padrao, 'tipo': 'combate', 'inimigos': [
+        s2 = {'mapa': [linha[:] for linha in layout_padrao], 'tipo': 'combate', 'inimigos': [
             {'nome': 'Goblin', 'vida': 30, 'dano': 5, 'xp': 20, 'pos': (3,3)},
             {'nome': 'Goblin', 'vida': 30, 'dano': 5, 'xp': 20, 'pos': (5,2)}
         ], 'obj': []}
         
         # Sala 3: Item (Tesouro)
-        s3 = {'mapa': layout_padrao, 'tipo': 'tesouro', 'inimigos': [], 'obj': [
+        s3 = {'mapa': [linha[:] for linha in layout_padrao], 'tipo': 'tesouro', 'inimigos': [], 'obj': [
             {'tipo': 'bau', 'pos': (4,4), 'item': {'nome': 'Espada Longa', 'dano': 8, 'tipo': 'arma'}}
         ]}
         
         # Sala 4: Buff (Fonte)
-        s4 = {'mapa': layout_padrao, 'tipo': 'fonte', 'inimigos': [], 'obj': [
+        s4 = {'mapa': [linha[:] for linha in layout_padrao], 'tipo': 'fonte', 'inimigos': [], 'obj': [
             {'tipo': 'fonte', 'pos': (4,4), 'buff': 'vida_full'}
         ]}
         
         # Sala 5: Boss
-        s5 = {'mapa': layout_padrao, 'tipo': 'boss', 'inimigos': [
+        s5 = {'mapa': [linha[:] for linha in layout_padrao], 'tipo': 'boss', 'inimigos': [
             {'nome': 'REI ORC', 'vida': 150, 'dano': 12, 'xp': 500, 'pos': (5,5), 'boss': True}
         ], 'obj': []}
         
@@ -303,13 +1694,17 @@ class Game:
 
     def carregar_sala(self, indice):
         self.sala_atual_idx = indice
-        dados = self.salas[indice]
+        dados = self.salas[indice] if self.gerador is None else self.obter_sala(indice)
+        self.sala_atual = dados
         self.mapa_atual = dados['mapa']
+        self.versao_mapa = 0
         
         self.inimigos = []
+        self.armazem = ArmazemInimigos(max(1, len(dados['inimigos'])))
+        self.agenda = Agenda()
         for ini in dados['inimigos']:
             boss = ini.get('boss', False)
-            mob = Inimigo(ini['pos'][0], ini['pos'][1], ini['nome'], ini, boss)
+            mob = Inimigo(ini['pos'][0], ini['pos'][1], ini['nome'], ini, boss, self.armazem)
             self.inimigos.append(mob)
             
         self.objetos = []
@@ -318,125 +1713,283 @@ class Game:
             self.objetos.append(o)
             
         # Adiciona portal de saída
-        self.portal = ObjetoInterativo(7, 7, 'portal', {})
+        portal_x, portal_y = dados.get('portal', (7, 7))
+        self.portal = ObjetoInterativo(portal_x, portal_y, 'portal', {})
         if dados['tipo'] in ['combate', 'boss']:
             self.portal.ativo = False # Trancado
         else:
             self.portal.ativo = True # Aberto
             
         self.objetos.append(self.portal)
-        self.player.grid_x, self.player.grid_y = 1, 1 # Spawn seguro
+        self.player.grid_x, self.player.grid_y = dados.get('spawn', (1, 1)) # Spawn seguro
+        # Entra já no spawn (sem deslizar desde a posição da sala anterior)
+        self.player.visual_x, self.player.visual_y = self.player.cart_para_iso(self.player.grid_x, self.player.grid_y)
+
+        # Índice espacial e camadas de desenho da sala
+        self.grade = GradeEspacial()
+        for ent in [self.player] + self.inimigos + self.objetos:
+            self.grade.adicionar(ent)
+        self.fila.montar([self.player] + self.inimigos + self.objetos)
+        self.visao.definir_sala(dados)
+        self.chao.definir_mapa(self.mapa_atual)
+        self.atualizar_visao()
+        if self.gerador: self.pre_gerar_sala(indice + 1)
         self.log(f"Entrou na Sala {indice + 1}")
 
+    def alterar_tile(self, x, y, valor):
+        """Muda um tile do mapa atual e invalida os caches que dependem dele"""
+        self.mapa_atual[y][x] = valor
+        self.versao_mapa += 1
+        self.sala_atual['modificada'] = True
+        self.chao.invalidar(x, y)
+
     def log(self, texto):
         self.log_msgs.append(texto)
         if len(self.log_msgs) > 5: self.log_msgs.pop(0)
 
     def desenhar_texto_central(self, texto, y_offset=0, cor=CORES['texto']):
-        surf = self.fonte_grande.render(texto, True, cor)
+        surf = self.textos.render(self.fonte_grande, texto, cor)
         rect = surf.get_rect(center=(LARGURA_TELA//2, ALTURA_TELA//2 + y_offset))
         self.tela.blit(surf, rect)
+        PERFIL.contar('blits')
 
     # --- LOOP PRINCIPAL ---
     def run(self):
-        while True:
-            self.input()
-            self.update()
-            self.draw()
-            self.clock.tick(FPS)
+        # Passo fixo: a lógica roda FPS ticks por segundo de relógio, o quadro lento só faz mais ticks de uma vez
+        passo = 1 / FPS
+        acumulado = 0.0
+        try:
+            while True:
+                inicio = time.perf_counter() # PERFIL.agora() é 0 com o perfilador desligado
+                t = PERFIL.agora()
+                self.input()
+                PERFIL.registrar('input', t)
+                t = PERFIL.agora()
+                # Arredonda: o jitter do clock em volta de 1 passo não vira quadro sem tick / com dois ticks
+                ticks = min(int(acumulado / passo + 0.5), MAX_UPDATES_QUADRO)
+                for _ in range(ticks):
+                    self.update()
+                acumulado = max(acumulado - ticks * passo, -passo / 2)
+                PERFIL.registrar('update', t)
+                t = PERFIL.agora()
+                self.draw()
+                PERFIL.registrar('draw', t)
+                PERFIL.fim_quadro()
+                self.resolucao.medir(time.perf_counter() - inicio)
+                # Atraso maior que MAX_UPDATES_QUADRO ticks é descartado (o jogo desacelera em vez de travar)
+                acumulado = min(acumulado + self.clock.tick(FPS) / 1000, passo * MAX_UPDATES_QUADRO)
+        finally:
+            # Saiu por exceção (o QUIT já fecha no input): a gravação vai pro disco do mesmo jeito
+            if self.gravador: self.gravador.finalizar(self)
+
+    def step(self, acoes=()):
+        """Avança a simulação exatamente um tick (sem input do pygame, sem draw, sem clock)"""
+        for acao in acoes:
+            self.aplicar_acao(acao)
+        self.update()
+        return self.estado_atual
 
     def input(self):
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
+                if self.gravador: self.gravador.finalizar(self)
                 pygame.quit(); sys.exit()
             
-            if event.type == pygame.KEYDOWN:
-                # Controles Globais
-                if event.key == pygame.K_ESCAPE:
-                    if self.estado_atual == self.STATE_PLAY: self.estado_atual = self.STATE_PAUSE
-                    elif self.estado_atual == self.STATE_PAUSE: self.estado_atual = self.STATE_PLAY
-                    elif self.estado_atual == self.STATE_INVENTORY: self.estado_atual = self.STATE_PLAY
-
-                # Controles por Estado
-                if self.estado_atual == self.STATE_MENU:
-                    if event.key == pygame.K_RETURN: self.estado_atual = self.STATE_PLAY
-                
-                elif self.estado_atual == self.STATE_PLAY:
-                    dx, dy = 0, 0
-                    if event.key == pygame.K_UP: dy = -1
-                    elif event.key == pygame.K_DOWN: dy = 1
-                    elif event.key == pygame.K_LEFT: dx = -1
-                    elif event.key == pygame.K_RIGHT: dx = 1
-                    elif event.key == pygame.K_SPACE: 
-                        res = self.player.atacar(self.inimigos)
-                        if res: self.log(res)
-                    elif event.key == pygame.K_i: self.estado_atual = self.STATE_INVENTORY
-                    elif event.key == pygame.K_e: self.interagir()
-                    
-                    if dx != 0 or dy != 0:
-                        self.player.mover(dx, dy, self.mapa_atual)
-                        # CORREÇÃO 2: Verificar o que tem no chão logo após mover
-                        self.checar_piso()
-
-                elif self.estado_atual == self.STATE_GAMEOVER or self.estado_atual == self.STATE_WIN:
-                    if event.key == pygame.K_r: # Reiniciar simples (recarrega tudo)
-                         self.__init__() 
+            if event.type == pygame.KEYDOWN and event.key in TECLAS_ACOES:
+                if self.gravador: self.gravador.registrar(self.tick, TECLAS_ACOES[event.key])
+                self.aplicar_acao(TECLAS_ACOES[event.key])
+
+    def aplicar_acao(self, acao):
+        # Controles Globais
+        if acao == 'pausa':
+            if self.estado_atual == self.STATE_PLAY: self.estado_atual = self.STATE_PAUSE
+            elif self.estado_atual == self.STATE_PAUSE: self.estado_atual = self.STATE_PLAY
+            elif self.estado_atual == self.STATE_INVENTORY: self.estado_atual = self.STATE_PLAY
+        elif acao == 'perfil':
+            PERFIL.alternar()
+        elif acao == 'salvar' and self.estado_atual == self.STATE_PLAY:
+            self.salvar_arquivo()
+        elif acao == 'carregar' and self.estado_atual != self.STATE_MENU:
+            self.carregar_arquivo()
+
+        # Controles por Estado
+        if self.estado_atual == self.STATE_MENU:
+            if acao == 'confirmar': self.estado_atual = self.STATE_PLAY
+        
+        elif self.estado_atual == self.STATE_PLAY:
+            dx, dy = DIRECOES_ACOES.get(acao, (0, 0))
+            if acao == 'atacar': 
+                res = self.player.atacar(self.grade.vizinhos(self.player.grid_x, self.player.grid_y, Inimigo))
+                if res: self.log(res)
+            elif acao == 'inventario': self.estado_atual = self.STATE_INVENTORY
+            elif acao == 'interagir': self.interagir()
+            
+            if dx != 0 or dy != 0:
+                self.player.mover(dx, dy, self.mapa_atual)
+                # CORREÇÃO 2: Verificar o que tem no chão logo após mover
+                self.checar_piso()
+
+        elif self.estado_atual == self.STATE_GAMEOVER or self.estado_atual == self.STATE_WIN:
+            if acao == 'reiniciar': # Reiniciar simples (recarrega tudo)
+                 self.reiniciar()
 
     def interagir(self):
         # Checa baú ou fonte (Portal agora é automático no checar_piso)
-        for obj in self.objetos:
-            if self.player.grid_x == obj.grid_x and self.player.grid_y == obj.grid_y:
-                if not obj.ativo: 
-                    # self.log("Está vazio!") # Removido para não floodar
-                    continue
-                
-                if obj.tipo == 'bau':
-                    item = obj.dados['item']
-                    self.player.inventario.append(item)
-                    self.log(f"Pegou: {item['nome']}")
-                    obj.ativo = False
-                
-                elif obj.tipo == 'fonte':
-                    self.player.vida = self.player.vida_max
-                    self.log("Vida restaurada!")
-                    obj.ativo = False
+        for obj in self.grade.em(self.player.grid_x, self.player.grid_y, ObjetoInterativo):
+            if not obj.ativo: 
+                # self.log("Está vazio!") # Removido para não floodar
+                continue
+            
+            if obj.tipo == 'bau':
+                item = obj.dados['item']
+                self.player.inventario.append(item)
+                self.log(f"Pegou: {item['nome']}")
+                obj.ativo = False
+            
+            elif obj.tipo == 'fonte':
+                self.player.vida = self.player.vida_max
+                self.log("Vida restaurada!")
+                obj.ativo = False
 
     def checar_piso(self):
         # CORREÇÃO 3: Lógica automática para entrar no portal ao pisar
         if self.player.grid_x == self.portal.grid_x and self.player.grid_y == self.portal.grid_y:
             if self.portal.ativo:
-                if self.sala_atual_idx < 4:
+                if self.sala_atual_idx < len(self.salas) - 1:
                     self.carregar_sala(self.sala_atual_idx + 1)
                 else:
                     self.estado_atual = self.STATE_WIN
             else:
                 self.log("Trancado! Mate os inimigos.")
 
+    def atualizar_visao(self):
+        exploradas, entraram = self.visao.atualizar(self.versao_mapa, self.player.grid_x, self.player.grid_y)
+        for x, y in exploradas:
+            self.chao.invalidar(x, y) # Chunk ganhou tile explorado
+        # Inimigo dormindo que o player passou a enxergar volta pra agenda (na ordem da sala)
+        acordam = [ini for x, y in entraram for ini in self.grade.em(x, y, Inimigo) if ini.dormindo]
+        for ini in sorted(acordam, key=lambda ini: ini.idx):
+            ini.dormindo = False
+            self.agenda.agendar(ini.velocidade, ini)
+
     def update(self):
+        self.tick += 1
+        self.atualizar_visao()
         if self.estado_atual == self.STATE_PLAY:
-            self.player.update_visual()
             if self.player.cooldown_ataque > 0: self.player.cooldown_ataque -= 1
             
-            inimigos_vivos = [i for i in self.inimigos if i.vivo]
-            
-            # Destranca portal se limpar sala
-            if not inimigos_vivos and not self.portal.ativo:
-                 if self.salas[self.sala_atual_idx]['tipo'] in ['combate', 'boss']:
+            # Destranca portal se limpar sala (a grade conta quem ainda está vivo)
+            if not self.grade.contar(Inimigo) and not self.portal.ativo:
+                 if self.sala_atual['tipo'] in ['combate', 'boss']:
                      self.portal.ativo = True
                      self.log("A sala abriu!")
             
-            # IA Inimigos
-            for ini in self.inimigos:
-                ini.update_visual()
-                ini.update_ia(self.player)
+            # IA Inimigos (um flow field pra sala inteira, recalculado só se o player mudou de célula)
+            t = PERFIL.agora()
+            self.campo.atualizar(self.mapa_atual, self.versao_mapa, self.player.grid_x, self.player.grid_y)
+            # Turnos pela agenda: o custo é por ação, não por inimigo
+            for ent, acao in self.agenda.avancar():
+                getattr(self, 'acao_' + acao)(ent)
+            PERFIL.registrar('ia', t)
 
             if self.player.vida <= 0:
                 self.estado_atual = self.STATE_GAMEOVER
 
-            # Câmera segue player
-            self.camera.update(self.player)
+    # --- AÇÕES DA AGENDA ---
+    def acao_turno(self, ini):
+        """Vez do inimigo: bate se estiver do lado do player, senão anda pelo flow field"""
+        if not ini.vivo: return # Morto sai da agenda
+        if not self.visao.visivel(ini.grid_x, ini.grid_y):
+            # Quem não vê o player não sente: dorme fora da agenda até atualizar_visao acordar
+            ini.dormindo = True
+            return
+        self.agenda.agendar(ini.velocidade, ini)
+        if abs(ini.grid_x - self.player.grid_x) + abs(ini.grid_y - self.player.grid_y) > 1:
+            ini.perseguir(self.campo, self.grade)
+        else:
+            self.acao_golpe(ini)
+
+    def acao_golpe(self, ini):
+        """Ataque que cai agora. Também pode ir pra agenda com atraso (erra se o player saiu do lado)"""
+        if not ini.vivo: return
+        ini.animador.tocar('ataque')
+        if abs(ini.grid_x - self.player.grid_x) + abs(ini.grid_y - self.player.grid_y) <= 1:
+            self.player.vida -= ini.dano
+
+    def interpolar(self, dt):
+        """Deslize dos visuais até o grid e câmera seguindo o player, pelo tempo real do quadro"""
+        if self.estado_atual != self.STATE_PLAY: return
+        self.player.update_visual(dt)
+        self.armazem.atualizar_visual(dt) # Em lote (NumPy)
+        self.camera.update(self.player, dt)
+
+    def animar(self, dt):
+        """Avança as animações de quem está na tela (antes do draw, pro modo dirty saber o quadro atual).
+        Só no PLAY, como o interpolar: pausado no meio de um passo, o boneco não corre parado."""
+        if self.estado_atual != self.STATE_PLAY: return
+        for ent, _, _ in self.fila.visiveis(self.camera, self.visao, ('atores',)):
+            alvo_x, alvo_y = ent.cart_para_iso(ent.grid_x, ent.grid_y)
+            movendo = abs(alvo_x - ent.visual_x) + abs(alvo_y - ent.visual_y) > 2
+            ent.animador.avancar(dt, movendo)
+
+    def retrato(self):
+        """O que está na tela agora: (chave global, {id: (rect, assinatura)}).
+        Mudou a chave global (estado, câmera, sala...) -> redesenha tudo."""
+        if self.estado_atual == self.STATE_MENU:
+            return (self.estado_atual,), {}
+        global_ = (self.estado_atual, self.camera.camera.x, self.camera.camera.y, id(self.mapa_atual), self.versao_mapa, self.visao.versao, PERFIL.ativo)
+        itens = {
+            'hud': (pygame.Rect(0, ALTURA_TELA-40, LARGURA_TELA, 40), (self.player.vida, self.player.vida_max, self.player.forca, self.player.arma_equipada['nome'])),
+            'log': (pygame.Rect(0, 0, LARGURA_TELA, 10 + 20 * 5), tuple(self.log_msgs)),
+        }
+        for ent, cam_x, cam_y in self.fila.visiveis(self.camera, self.visao):
+            # Caixa que cobre sprite (pivô no pé) + barra de vida, com folga
+            if ent.CAMADA == 'objetos':
+                rect = pygame.Rect(cam_x - 34, cam_y - 20, 68, 92)
+                assinatura = (cam_x, cam_y, ent.ativo)
+            else:
+                largura, altura = (90, 130) if getattr(ent, 'boss', False) else (50, 70)
+                rect = pygame.Rect(cam_x - largura // 2, cam_y + TILE_H - altura, largura, altura + 4)
+                assinatura = (cam_x, cam_y, ent.animador.chave_quadro(), getattr(ent, 'vida', 0))
+            itens[id(ent)] = (rect, assinatura)
+        return global_, itens
+
+    def regioes_sujas(self):
+        """None = redesenhar tudo, [] = nada mudou, senão a lista de retângulos a atualizar"""
+        anterior, atual = self.retrato_anterior, self.retrato()
+        self.retrato_anterior = atual
+        if anterior is None or anterior[0] != atual[0]:
+            return None
+        regioes = []
+        for chave in anterior[1].keys() | atual[1].keys():
+            antes, agora = anterior[1].get(chave), atual[1].get(chave)
+            if antes == agora: continue
+            if antes: regioes.append(antes[0])
+            if agora: regioes.append(agora[0])
+        return regioes
 
     def draw(self):
+        dt = self.clock.get_time() / 1000 if self.clock.get_time() else 1 / FPS # Tempo real do último quadro
+        self.interpolar(dt)
+        self.animar(dt)
+
+        escala = self.resolucao.escala
+        mundo = self.tela
+        if escala != 1.0:
+            tamanho = (round(LARGURA_TELA * escala), round(ALTURA_TELA * escala))
+            if self.tela_mundo is None or self.tela_mundo.get_size() != tamanho:
+                self.tela_mundo = pygame.Surface(tamanho).convert()
+            mundo = self.tela_mundo
+
+        regioes = None
+        if self.modo_dirty and escala == 1.0:
+            regioes = self.regioes_sujas()
+            if regioes == []: return # Quadro idêntico: nem desenha nem faz flip
+            if regioes:
+                self.tela.set_clip(regioes[0].unionall(regioes[1:]))
+        else:
+            self.retrato_anterior = None # Esticando o mundo todo quadro: não dá pra saber o que mudou
+
         self.tela.fill(CORES['bg'])
         
         if self.estado_atual == self.STATE_MENU:
@@ -444,39 +1997,26 @@ class Game:
             self.desenhar_texto_central("Pressione [ENTER]", 50, (200,200,200))
         
         elif self.estado_atual in [self.STATE_PLAY, self.STATE_PAUSE, self.STATE_INVENTORY, self.STATE_GAMEOVER, self.STATE_WIN]:
-            # 1. Desenha Mapa
-            for y, linha in enumerate(self.mapa_atual):
-                for x, tile in enumerate(linha):
-                    if tile == 1:
-                        iso_x, iso_y = (x - y) * (TILE_W / 2), (x + y) * (TILE_H / 2)
-                        cam_x, cam_y = self.camera.apply(iso_x, iso_y)
-                        self.assets.desenhar(self.tela, 'chao', cam_x, cam_y, CORES['chao'], 'losango')
-
-            # 2. Desenha Entidades (Y-Sort)
-            entidades = [self.player] + [i for i in self.inimigos if i.vivo] + [o for o in self.objetos if o.ativo or o.tipo=='portal']
-            entidades.sort(key=lambda e: e.grid_y)
-
-            for ent in entidades:
-                cam_x, cam_y = self.camera.apply(ent.visual_x, ent.visual_y)
-                
-                if isinstance(ent, Player):
-                    self.assets.desenhar(self.tela, 'player', cam_x, cam_y, CORES['player'], 'circulo')
-                elif isinstance(ent, Inimigo):
-                    cor = CORES['boss'] if ent.boss else CORES['inimigo']
-                    self.assets.desenhar(self.tela, 'inimigo', cam_x, cam_y, cor, 'circulo')
-                    
-                    # CORREÇÃO 4: Barra de vida corrigida (proporção correta)
-                    pygame.draw.rect(self.tela, (255,0,0), (cam_x-10, cam_y-30, 20, 4))
-                    if ent.vida_max > 0:
-                        pct = ent.vida / ent.vida_max
-                        pygame.draw.rect(self.tela, (0,255,0), (cam_x-10, cam_y-30, 20*pct, 4))
-                
-                elif isinstance(ent, ObjetoInterativo):
-                    cor = CORES[ent.tipo]
-                    if ent.tipo == 'portal' and not ent.ativo: cor = (50,0,0) # Trancado
-                    self.assets.desenhar(self.tela, ent.tipo, cam_x, cam_y, cor, 'retangulo')
+            # 1. Desenha Mapa (só os chunks pré-renderizados que aparecem na tela)
+            t = PERFIL.agora()
+            if mundo is not self.tela: mundo.fill(CORES['bg'])
+            self.chao.desenhar(mundo, self.camera, escala)
+            PERFIL.registrar('chao', t)
+
+            # 2. Objetos e atores (camadas já em ordem de profundidade, um blits por camada)
+            t = PERFIL.agora()
+            barras = self.fila.desenhar(mundo, self.camera, self.visao, escala)
+            PERFIL.registrar('entidades', t)
+
+            # Mundo reduzido -> janela; barras de vida por cima, na resolução cheia
+            t = PERFIL.agora()
+            if mundo is not self.tela:
+                pygame.transform.scale(mundo, (LARGURA_TELA, ALTURA_TELA), self.tela)
+            self.fila.emitir(self.tela, barras)
+            PERFIL.registrar('escalar', t)
 
             # 3. UI Overlay
+            t = PERFIL.agora()
             self.desenhar_ui()
             
             # Telas Sobrepostas
@@ -490,43 +2030,57 @@ class Game:
             elif self.estado_atual == self.STATE_WIN:
                 self.desenhar_texto_central("VITÓRIA!", 0, (255,215,0))
                 self.desenhar_texto_central(f"Nível Final: {self.player.nivel}", 50)
+            PERFIL.registrar('ui', t)
 
-        pygame.display.flip()
+        PERFIL.desenhar(self.tela, self.fonte)
+        t = PERFIL.agora()
+        if regioes:
+            self.tela.set_clip(None)
+            pygame.display.update(regioes)
+        else:
+            pygame.display.flip()
+        PERFIL.registrar('flip', t)
 
     def desenhar_ui(self):
         # HUD Inferior
         pygame.draw.rect(self.tela, (50,50,50), (0, ALTURA_TELA-40, LARGURA_TELA, 40))
-        texto = f"Vida: {self.player.vida}/{self.player.vida_max}  |  Força: {self.player.forca}  |  Arma: {self.player.arma_equipada['nome']}"
-        surf = self.fonte.render(texto, True, CORES['texto'])
-        self.tela.blit(surf, (10, ALTURA_TELA-30))
+        # Só renderiza de novo quando algum valor mostrado muda
+        chave = (self.player.vida, self.player.vida_max, self.player.forca, self.player.arma_equipada['nome'])
+        if chave != self.hud_chave:
+            texto = f"Vida: {self.player.vida}/{self.player.vida_max}  |  Força: {self.player.forca}  |  Arma: {self.player.arma_equipada['nome']}"
+            self.hud_surf = self.fonte.render(texto, True, CORES['texto'])
+            PERFIL.contar('textos')
+            self.hud_chave = chave
+        self.tela.blit(self.hud_surf, (10, ALTURA_TELA-30))
+        PERFIL.contar('blits')
         
         # Log
-        y = 10
-        for msg in reversed(self.log_msgs):
-            t = self.fonte.render(msg, True, (200,200,200))
-            self.tela.blit(t, (10, y))
-            y += 20
+        linhas = [(self.textos.render(self.fonte, msg, (200,200,200)), (10, 10 + 20 * i)) for i, msg in enumerate(reversed(self.log_msgs))]
+        self.tela.blits(linhas, doreturn=False)
+        PERFIL.contar('blits', len(linhas))
 
     def desenhar_inventario(self):
-        s = pygame.Surface((LARGURA_TELA, ALTURA_TELA), pygame.SRCALPHA)
-        s.fill((0,0,0,180))
-        self.tela.blit(s, (0,0))
+        if self.overlay_escuro is None:
+            self.overlay_escuro = pygame.Surface((LARGURA_TELA, ALTURA_TELA), pygame.SRCALPHA)
+            self.overlay_escuro.fill((0,0,0,180))
+        self.tela.blit(self.overlay_escuro, (0,0))
         
         cx, cy = LARGURA_TELA//2, ALTURA_TELA//2
         rect = pygame.Rect(cx-200, cy-150, 400, 300)
         pygame.draw.rect(self.tela, (30,30,40), rect)
         pygame.draw.rect(self.tela, (200,200,200), rect, 2)
         
-        self.tela.blit(self.fonte.render("INVENTÁRIO (ESC para sair)", True, CORES['texto']), (rect.x+10, rect.y+10))
+        self.tela.blit(self.textos.render(self.fonte, "INVENTÁRIO (ESC para sair)", CORES['texto']), (rect.x+10, rect.y+10))
         
         y_item = rect.y + 50
         if not self.player.inventario:
-            self.tela.blit(self.fonte.render("Vazio...", True, (150,150,150)), (rect.x+20, y_item))
+            self.tela.blit(self.textos.render(self.fonte, "Vazio...", (150,150,150)), (rect.x+20, y_item))
         else:
             for item in self.player.inventario:
                 txt = f"- {item['nome']} (+{item['dano']} atk)"
-                self.tela.blit(self.fonte.render(txt, True, CORES['texto']), (rect.x+20, y_item))
+                self.tela.blit(self.textos.render(self.fonte, txt, CORES['texto']), (rect.x+20, y_item))
                 y_item += 30
+        PERFIL.contar('blits', 2 + max(1, len(self.player.inventario))) # Fundo, título e linhas
 
 if __name__ == "__main__":
     Game().run()
\ No newline at end of file
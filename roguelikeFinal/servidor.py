@@ -0,0 +1,222 @@
+"""Servidor autoritativo (asyncio): roda as partidas headless num tick fixo e transmite o estado.
+
+Uso: python servidor.py [--host 127.0.0.1] [--porta 7777] [--tick-rate 60] [--envio 3]
+
+Protocolo: uma mensagem JSON por linha, sobre TCP.
+  cliente -> servidor  {"t": "entrar", "sessao": "nome", "papel": "jogador"|"espectador", "seed": 1, "procedural": false}
+                       {"t": "acao", "acao": "direita"}            (só o jogador da sessão)
+  servidor -> cliente  {"t": "bemvindo", "sessao": ..., "papel": ..., "tick_rate": ..., "envio": ...}
+                       {"t": "sala", "indice": i, "dados": {...}}  (sala inteira: ao entrar, trocar de sala ou mudar tile)
+                       {"t": "estado", "tick": n, "completo": true, "mudou": {...}}   (logo depois de "sala")
+                       {"t": "estado", "tick": n, "mudou": {...}, "saiu": [...]}    (delta contra o envio anterior)
+
+Cada sessão é um Game(headless=True) com um jogador e quantos espectadores quiserem; todas as
+sessões dividem o mesmo processo e o mesmo laço de ticks. O cliente (cliente.py) só desenha.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import time
+import zlib
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from roguelike_final import CODIGOS_ACOES, FPS, Game
+
+PORTA_PADRAO = 7777
+ENVIO_PADRAO = 3 # Manda estado a cada 3 ticks (20 Hz a 60 ticks/s); o cliente interpola o resto
+MAX_ATRASO = 0.25 # Segundos: mais atrasado que isso, o laço desiste de recuperar os ticks perdidos
+LIMITE_BUFFER = 1 << 20 # Cliente que não lê (mais de 1 MB pendente) é desconectado
+# Salvar/carregar/perfil mexem no disco/tela da máquina local: não vêm pela rede
+ACOES_REDE = [acao for acao in CODIGOS_ACOES if acao not in ('salvar', 'carregar', 'perfil')]
+
+
+# --- ESTADO NA REDE ---
+def codificar(msg):
+    return (json.dumps(msg, separators=(',', ':'), ensure_ascii=False) + '\n').encode('utf-8')
+
+def codificar_mapa(mapa):
+    altura, largura = len(mapa), len(mapa[0])
+    tiles = bytes(tile for linha in mapa for tile in linha)
+    return {'largura': largura, 'altura': altura, 'tiles': base64.b64encode(zlib.compress(tiles)).decode('ascii')}
+
+def decodificar_mapa(dados):
+    tiles = zlib.decompress(base64.b64decode(dados['tiles']))
+    largura = dados['largura']
+    return [list(tiles[y * largura:(y + 1) * largura]) for y in range(dados['altura'])]
+
+def sala_rede(sala):
+    """Dados da sala no formato do criar_salas (mapa comprimido; sem névoa nem flags locais)"""
+    dados = {chave: valor for chave, valor in sala.items() if chave not in ('mapa', 'explorado', 'modificada')}
+    dados['mapa'] = codificar_mapa(sala['mapa'])
+    return dados
+
+def estado_rede(jogo):
+    """Estado plano {chave: valor} do que o cliente desenha; o delta é por chave"""
+    p = jogo.player
+    estado = {
+        'estado': jogo.estado_atual,
+        'player': [p.grid_x, p.grid_y, p.vida, p.vida_max, p.forca, p.destreza, p.vitalidade, p.xp, p.nivel],
+        # Cópias: o delta compara com o envio anterior, não pode ser o mesmo objeto mutável
+        'arma': dict(p.arma_equipada),
+        'inv': [dict(item) for item in p.inventario],
+        'log': list(jogo.log_msgs),
+    }
+    for i, ini in enumerate(jogo.inimigos):
+        estado[f"i{i}"] = [ini.grid_x, ini.grid_y, ini.vida, ini.vivo]
+    for i, obj in enumerate(jogo.objetos):
+        estado[f"o{i}"] = obj.ativo
+    return estado
+
+def diferenca(antes, agora):
+    """(chaves que mudaram com o valor novo, chaves que sumiram)"""
+    mudou = {chave: valor for chave, valor in agora.items() if antes.get(chave) != valor}
+    saiu = [chave for chave in antes if chave not in agora]
+    return mudou, saiu
+
+
+# --- SESSÕES ---
+class Cliente:
+    def __init__(self, writer, papel):
+        self.writer = writer
+        self.papel = papel
+
+    def enviar(self, dados):
+        if self.writer.is_closing(): return
+        if self.writer.transport.get_write_buffer_size() > LIMITE_BUFFER:
+            self.writer.close() # Lento demais: derruba em vez de acumular memória
+            return
+        self.writer.write(dados)
+
+class Sessao:
+    """Uma partida headless com seus clientes (um jogador no máximo, espectadores à vontade)"""
+    def __init__(self, nome, seed=None, procedural=False):
+        self.nome = nome
+        self.jogo = Game(headless=True, seed=seed, procedural=procedural, modo_dirty=False, gravar=None)
+        self.clientes = []
+        self.acoes = [] # Entram no próximo tick, na ordem em que chegaram
+        self.ultimo = {} # Último estado transmitido (base do delta)
+        self.sala_enviada = None
+
+    def tem_jogador(self):
+        return any(c.papel == 'jogador' for c in self.clientes)
+
+    def chave_sala(self):
+        # Troca de sala, reinício (salas novas) ou tile alterado -> manda a sala inteira de novo
+        return self.jogo.sala_atual_idx, id(self.jogo.sala_atual), self.jogo.versao_mapa
+
+    def quadro_chave(self):
+        """Mensagens que deixam um cliente em dia do zero (sala + estado completo)"""
+        jogo = self.jogo
+        return (codificar({'t': 'sala', 'indice': jogo.sala_atual_idx, 'dados': sala_rede(jogo.sala_atual)})
+                + codificar({'t': 'estado', 'tick': jogo.tick, 'completo': True, 'mudou': self.ultimo}))
+
+    def entrar(self, cliente):
+        self.clientes.append(cliente)
+        if self.chave_sala() != self.sala_enviada:
+            self.transmitir() # Sala nova desde o último envio: quadro-chave pra todos (inclusive o novo)
+        else:
+            cliente.enviar(self.quadro_chave())
+
+    def sair(self, cliente):
+        if cliente in self.clientes: self.clientes.remove(cliente)
+
+    def passo(self):
+        acoes, self.acoes = self.acoes, []
+        self.jogo.step(acoes)
+
+    def transmitir(self):
+        """Delta desde o último envio, codificado uma vez só pra todos os clientes"""
+        agora = estado_rede(self.jogo)
+        if self.chave_sala() != self.sala_enviada:
+            self.sala_enviada, self.ultimo = self.chave_sala(), agora
+            dados = self.quadro_chave()
+        else:
+            mudou, saiu = diferenca(self.ultimo, agora)
+            if not mudou and not saiu: return
+            self.ultimo = agora
+            msg = {'t': 'estado', 'tick': self.jogo.tick, 'mudou': mudou}
+            if saiu: msg['saiu'] = saiu
+            dados = codificar(msg)
+        for cliente in self.clientes:
+            cliente.enviar(dados)
+
+    def fechar(self):
+        if self.jogo.executor: self.jogo.executor.shutdown(wait=False, cancel_futures=True)
+
+
+# --- SERVIDOR ---
+class Servidor:
+    def __init__(self, tick_rate=FPS, envio=ENVIO_PADRAO):
+        self.tick_rate = tick_rate
+        self.envio = envio
+        self.sessoes = {}
+
+    async def atender(self, reader, writer):
+        sessao = cliente = None
+        try:
+            msg = json.loads(await reader.readline() or 'null')
+            if not isinstance(msg, dict) or msg.get('t') != 'entrar': return
+            nome = str(msg.get('sessao', 'padrao'))
+            sessao = self.sessoes.get(nome)
+            if sessao is None:
+                seed = msg.get('seed') if isinstance(msg.get('seed'), int) else None
+                sessao = self.sessoes[nome] = Sessao(nome, seed, bool(msg.get('procedural')))
+            # Vaga de jogador ocupada: entra assistindo
+            papel = 'jogador' if msg.get('papel', 'jogador') == 'jogador' and not sessao.tem_jogador() else 'espectador'
+            cliente = Cliente(writer, papel)
+            cliente.enviar(codificar({'t': 'bemvindo', 'sessao': nome, 'papel': papel, 'tick_rate': self.tick_rate, 'envio': self.envio}))
+            sessao.entrar(cliente)
+
+            async for linha in reader:
+                msg = json.loads(linha)
+                if msg.get('t') == 'acao' and cliente.papel == 'jogador' and msg.get('acao') in ACOES_REDE:
+                    sessao.acoes.append(msg['acao'])
+        except (ConnectionError, ValueError, AttributeError):
+            pass # Cliente caiu ou mandou lixo: só sai da sessão
+        finally:
+            if sessao:
+                sessao.sair(cliente)
+                if not sessao.clientes: # Ninguém mais na sessão: a partida acaba
+                    sessao.fechar()
+                    self.sessoes.pop(sessao.nome, None)
+            writer.close()
+
+    async def rodar_ticks(self):
+        """Tick fixo pra todas as sessões; manda o estado a cada `envio` ticks"""
+        intervalo = 1 / self.tick_rate
+        proximo = time.perf_counter()
+        while True:
+            for sessao in list(self.sessoes.values()):
+                sessao.passo()
+                if sessao.jogo.tick % self.envio == 0:
+                    sessao.transmitir()
+            proximo += intervalo
+            atraso = proximo - time.perf_counter()
+            if atraso < -MAX_ATRASO: proximo = time.perf_counter() # Travou: segue do agora
+            await asyncio.sleep(max(0.0, atraso))
+
+    async def servir(self, host, porta):
+        servidor = await asyncio.start_server(self.atender, host, porta)
+        print(f"Servidor em {host}:{porta} ({self.tick_rate} ticks/s, estado a cada {self.envio} ticks)")
+        async with servidor:
+            await asyncio.gather(servidor.serve_forever(), self.rodar_ticks())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de partidas headless (JSON por linha sobre TCP)")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=PORTA_PADRAO)
+    parser.add_argument('--tick-rate', type=int, default=FPS)
+    parser.add_argument('--envio', type=int, default=ENVIO_PADRAO, help="Ticks entre um envio de estado e outro")
+    args = parser.parse_args()
+    try:
+        asyncio.run(Servidor(args.tick_rate, args.envio).servir(args.host, args.porta))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
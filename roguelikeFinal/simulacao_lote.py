@@ -0,0 +1,171 @@
+"""Roda muitas partidas headless (política scripted) em paralelo e junta as estatísticas.
+
+Uso: python simulacao_lote.py --runs 1000 --seed 42 [--workers N] [--procedural] [--json relatorio.json]
+
+Cada run vai de carregar_sala(0) até STATE_WIN / STATE_GAMEOVER (ou estourar --max-ticks).
+Serve pra balancear vida/dano/xp dos inimigos em criar_salas sem jogar na mão.
+A seed de cada run também é a seed do Game: a run do relatório se repete com Game(seed=...).
+"""
+import argparse
+import json
+import os
+import random
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+os.environ.setdefault('PYGAME_HIDE_SUPPORT_PROMPT', '1')
+
+from roguelike_final import DIRECOES_ACOES, CampoFluxo, Game
+
+MAX_TICKS_PADRAO = 60 * 60 * 10 # 10 minutos de jogo
+TICKS_POR_PASSO = 8 # Um humano não aperta seta 60x por segundo
+# BFS sem limite de raio até o destino; só recalcula quando mapa ou destino mudam
+CAMPO_POLITICA = CampoFluxo(raio=10**6)
+
+
+# --- POLÍTICA SCRIPTED ---
+def passo_ate(jogo, origem, alvo, rng):
+    """Ação de movimento de origem até alvo contornando paredes (sorteia quando dois passos servem)"""
+    campo = CAMPO_POLITICA
+    campo.atualizar(jogo.mapa_atual, jogo.versao_mapa, *alvo)
+    if campo.sujo: campo.recalcular()
+    atual = campo.dist.get(origem)
+    if atual is None: return None
+    opcoes = [acao for acao, (dx, dy) in DIRECOES_ACOES.items()
+              if campo.dist.get((origem[0] + dx, origem[1] + dy), atual) < atual]
+    return rng.choice(opcoes) if opcoes else None
+
+def politica_script(jogo, rng, tick):
+    """Decide as ações do tick: mata o inimigo mais perto, pega baú/fonte, vai pro portal"""
+    if jogo.estado_atual == jogo.STATE_MENU:
+        return ['confirmar']
+    if jogo.estado_atual != jogo.STATE_PLAY:
+        return []
+
+    p = jogo.player
+    pos = (p.grid_x, p.grid_y)
+    vivos = [i for i in jogo.inimigos if i.vivo]
+    if vivos:
+        alvo = min(vivos, key=lambda i: abs(i.grid_x - p.grid_x) + abs(i.grid_y - p.grid_y))
+        dist = abs(alvo.grid_x - p.grid_x) + abs(alvo.grid_y - p.grid_y)
+        if dist <= 1:
+            return ['atacar'] if p.cooldown_ataque == 0 else []
+        destino = (alvo.grid_x, alvo.grid_y)
+    else:
+        pendentes = [o for o in jogo.objetos if o.ativo and o.tipo in ('bau', 'fonte')]
+        if pendentes:
+            obj = pendentes[0]
+            if (obj.grid_x, obj.grid_y) == pos:
+                return ['interagir']
+            destino = (obj.grid_x, obj.grid_y)
+        else:
+            destino = (jogo.portal.grid_x, jogo.portal.grid_y)
+
+    if tick % TICKS_POR_PASSO:
+        return []
+    acao = passo_ate(jogo, pos, destino, rng)
+    return [acao] if acao else []
+
+
+# --- UMA PARTIDA ---
+def simular_run(args):
+    """Joga uma partida inteira (roda no processo worker). Retorna só dados pequenos pra IPC."""
+    seed, max_ticks, procedural = args
+    rng = random.Random(seed)
+    jogo = Game(headless=True, seed=seed, procedural=procedural, modo_dirty=False, gravar=None)
+
+    salas = [{'ticks': 0, 'dano': 0} for _ in jogo.salas]
+    vida_antes = jogo.player.vida
+    tick = 0
+    while tick < max_ticks and jogo.estado_atual not in (jogo.STATE_WIN, jogo.STATE_GAMEOVER):
+        sala = jogo.sala_atual_idx
+        jogo.step(politica_script(jogo, rng, tick))
+        tick += 1
+
+        salas[sala]['ticks'] += 1
+        if jogo.player.vida < vida_antes:
+            salas[sala]['dano'] += vida_antes - jogo.player.vida
+        vida_antes = jogo.player.vida
+
+    if jogo.executor: jogo.executor.shutdown(wait=False, cancel_futures=True)
+    return {
+        'seed': seed,
+        'vitoria': jogo.estado_atual == jogo.STATE_WIN,
+        'timeout': tick >= max_ticks,
+        'ticks': tick,
+        'sala_final': jogo.sala_atual_idx,
+        'nivel': jogo.player.nivel,
+        'salas': salas,
+    }
+
+
+# --- RELATÓRIO ---
+def media(valores):
+    return sum(valores) / len(valores) if valores else 0.0
+
+def montar_relatorio(resultados, segundos, workers):
+    n = len(resultados)
+    n_salas = len(resultados[0]['salas']) if resultados else 0
+    salas = []
+    for i in range(n_salas):
+        # Só conta quem chegou na sala (quem morreu antes não entra na média)
+        chegaram = [r for r in resultados if r['sala_final'] >= i]
+        limpas = [r for r in chegaram if r['sala_final'] > i or r['vitoria']]
+        salas.append({
+            'sala': i + 1,
+            'chegaram': len(chegaram),
+            'mortes': sum(1 for r in chegaram if r['sala_final'] == i and not r['vitoria'] and not r['timeout']),
+            'ticks_para_limpar': media([r['salas'][i]['ticks'] for r in limpas]),
+            'dano_medio': media([r['salas'][i]['dano'] for r in chegaram]),
+            'dano_max': max((r['salas'][i]['dano'] for r in chegaram), default=0),
+        })
+    return {
+        'runs': n,
+        'workers': workers,
+        'segundos': segundos,
+        'runs_por_segundo': n / segundos if segundos else 0.0,
+        'taxa_vitoria': sum(1 for r in resultados if r['vitoria']) / n if n else 0.0,
+        'timeouts': sum(1 for r in resultados if r['timeout']),
+        'ticks_medio': media([r['ticks'] for r in resultados]),
+        'salas': salas,
+    }
+
+def imprimir_relatorio(rel):
+    print(f"{rel['runs']} runs em {rel['segundos']:.2f}s ({rel['runs_por_segundo']:.1f} runs/s, {rel['workers']} workers)")
+    print(f"Vitórias: {rel['taxa_vitoria'] * 100:.1f}%  |  Timeouts: {rel['timeouts']}  |  Ticks médios: {rel['ticks_medio']:.0f}")
+    print(f"{'Sala':>4} {'Chegaram':>9} {'Mortes':>7} {'Ticks p/ limpar':>16} {'Dano médio':>11} {'Dano máx':>9}")
+    for s in rel['salas']:
+        print(f"{s['sala']:>4} {s['chegaram']:>9} {s['mortes']:>7} {s['ticks_para_limpar']:>16.0f} {s['dano_medio']:>11.1f} {s['dano_max']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulação em lote (headless) das 5 salas")
+    parser.add_argument('--runs', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=0, help="Seed base; a run i usa seed + i")
+    parser.add_argument('--workers', type=int, default=os.cpu_count())
+    parser.add_argument('--max-ticks', type=int, default=MAX_TICKS_PADRAO)
+    parser.add_argument('--procedural', action='store_true', help="Masmorras geradas (BSP) em vez das 5 salas fixas")
+    parser.add_argument('--json', help="Salva o relatório nesse arquivo")
+    args = parser.parse_args()
+
+    tarefas = [(args.seed + i, args.max_ticks, args.procedural) for i in range(args.runs)]
+    # Lotes grandes por worker: cada run é independente, então o custo de IPC é o que limita a escala
+    chunksize = max(1, len(tarefas) // (args.workers * 4))
+
+    inicio = time.perf_counter()
+    if args.workers <= 1:
+        resultados = [simular_run(t) for t in tarefas]
+    else:
+        with ProcessPoolExecutor(max_workers=args.workers) as pool:
+            resultados = list(pool.map(simular_run, tarefas, chunksize=chunksize))
+    segundos = time.perf_counter() - inicio
+
+    rel = montar_relatorio(resultados, segundos, args.workers)
+    imprimir_relatorio(rel)
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(rel, f, indent=2, ensure_ascii=False)
+
+
+if __name__ == "__main__":
+    main()